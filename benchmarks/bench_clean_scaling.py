@@ -0,0 +1,46 @@
+"""
+    Time of TextCleaner.clean() for one input text growing from 1 KB to 50 MB. With linear scaling the
+    time per KB stays about the same for all sizes.
+
+    Usage: python -m benchmarks.bench_clean_scaling [--max-size MB]
+"""
+import argparse
+import time
+
+from benchmarks.corpus import icelandic_text
+from text_cleaner import TextCleaner
+import text_cleaner.unicode_maps as umaps
+
+KB = 1024
+MB = 1024 * KB
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--max-size', type=float, default=50, help="Size of the largest input in MB")
+    args = parser.parse_args()
+
+    cleaner = TextCleaner(replacement_dict=umaps.replacement_dictionary, post_dict=umaps.post_dict_lookup)
+    max_size = int(args.max_size * MB)
+    corpus = icelandic_text(max_size)
+    sizes = []
+    size = KB
+    while size < max_size:
+        sizes.append(size)
+        size *= 4
+    sizes.append(max_size)
+
+    print('      size     seconds    µs/KB')
+    for size in sizes:
+        text = corpus[:size]
+        # repeat small inputs to get a measurable time
+        repeat = max(1, MB // size)
+        start = time.perf_counter()
+        for _ in range(repeat):
+            cleaner.clean(text)
+        seconds = (time.perf_counter() - start) / repeat
+        print('{:8.0f}KB {:11.4f} {:8.1f}'.format(size / KB, seconds, seconds * 1e6 * KB / size))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,48 @@
+"""
+    Speed of TextCleaner.clean() on text that needs no character cleaning, with and without the fast path
+    for valid tokens and texts (TextCleaner.valid_token and TextCleaner.valid_text).
+
+    Usage: python -m benchmarks.bench_fast_path [--lines N]
+"""
+import argparse
+import re
+import time
+
+from benchmarks.corpus import icelandic_lines
+from text_cleaner import TextCleaner
+import text_cleaner.unicode_maps as umaps
+
+# never matches, turns the fast path off
+NO_MATCH = re.compile(r'(?!)')
+
+
+def time_clean(cleaner: TextCleaner, lines: list) -> float:
+    start = time.perf_counter()
+    for line in lines:
+        cleaner.clean(line)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--lines', type=int, default=50000, help="Number of lines to clean")
+    args = parser.parse_args()
+
+    inputs = {
+        'clean text': icelandic_lines(args.lines, foreign=0, emojis=0, special=0),
+        'mixed text': icelandic_lines(args.lines),
+    }
+    fast = TextCleaner(replacement_dict=umaps.replacement_dictionary, post_dict=umaps.post_dict_lookup)
+    slow = TextCleaner(replacement_dict=umaps.replacement_dictionary, post_dict=umaps.post_dict_lookup)
+    slow.valid_token = slow.valid_text = NO_MATCH
+
+    print('input        without fast path   with fast path   speedup')
+    for name, lines in inputs.items():
+        slow_seconds = time_clean(slow, lines)
+        fast_seconds = time_clean(fast, lines)
+        print('{:12s} {:18.3f}s {:15.3f}s {:8.2f}x'.format(name, slow_seconds, fast_seconds,
+                                                           slow_seconds / fast_seconds))
+
+
+if __name__ == '__main__':
+    main()
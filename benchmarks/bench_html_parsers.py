@@ -0,0 +1,92 @@
+"""
+    Speed and peak memory of HtmlCleaner.clean_html() with each BeautifulSoup parser backend that is installed
+    (html.parser, lxml, html5lib) and with the stream engine, see html_stream.py, on EPUB-like html from
+    corpus.py. Also checks that every backend gives the same text as html.parser.
+
+    Each parser runs in a fresh interpreter, so the peak memory of one does not hide the peak of the next.
+    'peak MB' is the growth of the peak resident set size while cleaning, which includes the memory of the
+    C parsers, 'python MB' the peak of the Python objects as traced by tracemalloc (in a separate, untimed run).
+    The resident set size is read with the resource module, which is not available on Windows.
+
+    Usage: python -m benchmarks.bench_html_parsers [--sections N] [--repeat N]
+"""
+import argparse
+import hashlib
+import json
+import resource
+import subprocess
+import sys
+import time
+import tracemalloc
+import warnings
+
+from benchmarks.corpus import epub_html
+
+
+def peak_rss_mb() -> float:
+    # kilobytes on Linux, bytes on macOS
+    scale = 2**20 if sys.platform == 'darwin' else 2**10
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / scale
+
+
+def measure(parser: str, sections: int, repeat: int) -> dict:
+    """
+    Clean the html of 'sections' sections with 'parser' 'repeat' times, called in the worker interpreter.
+    'parser' is one of the BeautifulSoup parsers or 'stream' for the stream engine.
+    """
+    from text_cleaner.clean_html import HtmlCleaner
+    # lxml and html5lib warn that the EPUB html looks like XML, it is parsed as html on purpose
+    warnings.simplefilter('ignore')
+    html = epub_html(sections, seed=1)
+    cleaner = HtmlCleaner(engine='stream') if parser == 'stream' else HtmlCleaner(parser=parser)
+    rss_before = peak_rss_mb()
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        text = cleaner.clean_html(html)
+        times.append(time.perf_counter() - start)
+    rss_peak = peak_rss_mb() - rss_before
+    tracemalloc.start()
+    cleaner.clean_html(html)
+    python_peak = tracemalloc.get_traced_memory()[1] / 2**20
+    tracemalloc.stop()
+    return {'parser': parser, 'chars': len(html), 'min': min(times), 'peak_mb': rss_peak,
+            'python_mb': python_peak, 'sha1': hashlib.sha1(text.encode()).hexdigest()}
+
+
+def run_worker(parser: str, sections: int, repeat: int) -> dict:
+    result = subprocess.run([sys.executable, '-m', 'benchmarks.bench_html_parsers', '--worker', parser,
+                             '--sections', str(sections), '--repeat', str(repeat)],
+                            stdout=subprocess.PIPE, universal_newlines=True, check=True)
+    return json.loads(result.stdout)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--sections', type=int, default=200, help="Number of sections of the html document")
+    parser.add_argument('--repeat', type=int, default=5, help="Number of timed runs of each parser")
+    parser.add_argument('--worker', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.worker:
+        print(json.dumps(measure(args.worker, args.sections, args.repeat)))
+        return
+
+    from bs4.builder import builder_registry
+    from text_cleaner.clean_html import DEFAULT_PARSER, PARSERS
+    print('{:12s} {:>10s} {:>10s} {:>10s} {:>10s}  {}'.format('parser', 'seconds', 'MB/s', 'peak MB', 'python MB',
+                                                             'same text'))
+    reference = None
+    for name in PARSERS + ('stream',):
+        if name != 'stream' and builder_registry.lookup(name) is None:
+            print('{:12s} not installed'.format(name))
+            continue
+        result = run_worker(name, args.sections, args.repeat)
+        if name == DEFAULT_PARSER:
+            reference = result['sha1']
+        print('{:12s} {:10.3f} {:10.2f} {:10.1f} {:10.1f}  {}'.format(
+            name, result['min'], result['chars'] / result['min'] / 2**20, result['peak_mb'], result['python_mb'],
+            'yes' if result['sha1'] == reference else 'NO'))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,49 @@
+"""
+    Startup cost of 'import text_cleaner', measured with 'python -X importtime'. Reports the median over
+    several runs of the cumulative import time of text_cleaner and of the slowest modules it imports, and
+    exits with status 1 if text_cleaner takes longer than the budget.
+
+    Usage: python -m benchmarks.bench_import [--runs N] [--budget MS] [--module NAME]
+"""
+import argparse
+import statistics
+import subprocess
+import sys
+
+
+def import_times(module: str) -> dict:
+    """
+    Import 'module' in a fresh interpreter, return the cumulative import time in ms of each imported module.
+    """
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', 'import ' + module],
+                            stderr=subprocess.PIPE, universal_newlines=True, check=True)
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        times[name.strip()] = int(cumulative) / 1000
+    return times
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--runs', type=int, default=10, help="Number of interpreter starts")
+    parser.add_argument('--budget', type=float, default=50, help="Allowed import time in ms")
+    parser.add_argument('--module', default='text_cleaner', help="Module to import")
+    parser.add_argument('--top', type=int, default=10, help="Number of slowest imported modules to list")
+    args = parser.parse_args()
+
+    runs = [import_times(args.module) for _ in range(args.runs)]
+    modules = set().union(*runs)
+    medians = {name: statistics.median(run.get(name, 0) for run in runs) for name in modules}
+    for name in sorted(medians, key=medians.get, reverse=True)[:args.top]:
+        print('{:10.2f} ms  {}'.format(medians[name], name))
+    total = medians[args.module]
+    print('import {}: {:.2f} ms, budget {:.2f} ms'.format(args.module, total, args.budget))
+    if total > args.budget:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,47 @@
+"""
+    Throughput of the text_cleaner console script with an increasing number of worker processes (--jobs).
+
+    Usage: python -m benchmarks.bench_parallel [--lines N] [--max-jobs N]
+"""
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks.corpus import icelandic_lines
+
+
+def run_cleaner(infile: str, jobs: int) -> float:
+    start = time.perf_counter()
+    subprocess.run([sys.executable, '-c', 'from text_cleaner.clean import main; main()',
+                    '-i', infile, '--jobs', str(jobs)],
+                   stdout=subprocess.DEVNULL, check=True)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--lines', type=int, default=200000, help="Number of lines in the input file")
+    parser.add_argument('--max-jobs', type=int, default=os.cpu_count(), help="Highest number of processes to run")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        infile = os.path.join(tmp_dir, 'corpus.txt')
+        with open(infile, 'w') as f:
+            f.write('\n'.join(icelandic_lines(args.lines)) + '\n')
+        size = os.path.getsize(infile) / 2**20
+
+        jobs = 1
+        baseline = None
+        print('jobs     seconds     MB/s  speedup')
+        while jobs <= args.max_jobs:
+            seconds = run_cleaner(infile, jobs)
+            baseline = baseline or seconds
+            print('{:4d} {:11.2f} {:8.2f} {:8.2f}'.format(jobs, seconds, size / seconds, baseline / seconds))
+            jobs *= 2
+
+
+if __name__ == '__main__':
+    main()
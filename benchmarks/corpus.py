@@ -0,0 +1,91 @@
+"""
+    Synthetic input for the benchmarks: Icelandic text with the usual share of foreign characters, symbols,
+    emojis, URLs and parenthesised translations. The text is generated from a fixed seed, so every run
+    measures the same input.
+"""
+import random
+import re
+
+WORDS = ['og', 'að', 'í', 'á', 'það', 'er', 'sem', 'hann', 'hún', 'við', 'til', 'með', 'fyrir', 'var', 'ekki',
+         'Reykjavík', 'Akureyri', 'ríkisstjórnin', 'sveitarfélögin', 'heilbrigðisþjónusta', 'kjarasamningar',
+         'þjóðin', 'fjárlög', 'ársins', 'Íslands', 'Þórður', 'Guðrún', 'sögðu', 'fréttir', 'veðrið', 'ferðamenn',
+         'þúsund', 'krónur', 'milljarða', 'prósent', 'Jón', 'Gunnu', 'afmælissönginn', 'söng', 'Bubbi']
+NUMBERS = ['3.14', '12', '2022', '5-2', '100%', '1.000']
+FOREIGN = ['Zürich', 'Øresund', 'Kraków', 'ß', 'π', 'café', 'Dvořák', 'Łódź', 'σ', '×', '→', '€']
+EMOJIS = ['🎉', '😎', '👍🏽', '🇮🇸', '🔥', '👨‍👩‍👧']
+SPECIAL = ['(e. humidity)', '(e. sense of coherence)', 'https://www.ruv.is/frettir', 'www.mbl.is', '...', '?!']
+
+
+def icelandic_text(size: int, seed=0, foreign=0.03, emojis=0.01, special=0.01) -> str:
+    """
+    Return about 'size' characters of sentences. 'foreign', 'emojis' and 'special' are the shares of tokens
+    taken from FOREIGN, EMOJIS and SPECIAL, the rest are Icelandic words and numbers.
+    """
+    rnd = random.Random(seed)
+    sentences = []
+    length = 0
+    while length < size:
+        tokens = []
+        for _ in range(rnd.randint(5, 20)):
+            choice = rnd.random()
+            if choice < foreign:
+                tokens.append(rnd.choice(FOREIGN))
+            elif choice < foreign + emojis:
+                tokens.append(rnd.choice(EMOJIS))
+            elif choice < foreign + emojis + special:
+                tokens.append(rnd.choice(SPECIAL))
+            elif choice < foreign + emojis + special + 0.05:
+                tokens.append(rnd.choice(NUMBERS))
+            else:
+                tokens.append(rnd.choice(WORDS))
+        tokens[0] = tokens[0][:1].upper() + tokens[0][1:]
+        sentence = ' '.join(tokens) + rnd.choice(['.', '.', '.', '?', '!', ','])
+        sentences.append(sentence)
+        length += len(sentence) + 1
+    return ' '.join(sentences)[:size]
+
+
+def icelandic_lines(count: int, seed=0, line_length=120, **shares) -> list:
+    """
+    Return 'count' lines of about 'line_length' characters, see icelandic_text()
+    """
+    text = icelandic_text(count * line_length, seed, **shares)
+    return [text[i:i + line_length] for i in range(0, len(text), line_length)]
+
+
+def epub_html(sections: int, seed=0) -> str:
+    """
+    Return an html document like the chapters of an accessible EPUB book: 'sections' sections of headings,
+    paragraphs of sentence spans, lists and tables with header rows, inside a <div class="content-text">.
+    """
+    rnd = random.Random(seed)
+    sentence_id = 0
+
+    def paragraph(sentences):
+        nonlocal sentence_id
+        spans = []
+        for sentence in sentences:
+            sentence_id += 1
+            spans.append('<span id="qitl_{:04d}" class="sentence">{}</span>'.format(sentence_id, sentence))
+        return '<p id="hix{:05d}">{}</p>'.format(sentence_id, ' '.join(spans))
+
+    def sentences(count):
+        text = icelandic_text(count * 100, rnd.random())
+        return re.split(r'(?<=[.?!]) ', text)[:count]
+
+    body = []
+    for section in range(sections):
+        body.append('<h1>{}. kafli</h1>'.format(section + 1))
+        body.append('<h2>{}</h2>'.format(sentences(1)[0]))
+        for _ in range(rnd.randint(2, 5)):
+            body.append(paragraph(sentences(rnd.randint(2, 6))))
+        body.append('<ul>' + ''.join('<li>' + item + '</li>' for item in sentences(rnd.randint(2, 5))) + '</ul>')
+        if rnd.random() < 0.5:
+            columns = rnd.randint(2, 4)
+            header = '<tr>' + ''.join('<th>' + rnd.choice(WORDS) + '</th>' for _ in range(columns)) + '</tr>'
+            rows = ''.join('<tr>' + ''.join('<td>' + rnd.choice(NUMBERS + WORDS) + '</td>' for _ in range(columns))
+                           + '</tr>' for _ in range(rnd.randint(2, 8)))
+            body.append('<table>' + header + rows + '</table>')
+    return ('<?xml version="1.0" encoding="utf-8"?>\n<html xmlns="http://www.w3.org/1999/xhtml"><head>'
+            '<title>Bók</title></head><body><div class="content-text">\n' + '\n'.join(body) +
+            '\n</div></body></html>')
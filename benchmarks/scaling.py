@@ -0,0 +1,198 @@
+"""
+    Detects super-linear scaling: runs each public cleaning function over inputs growing geometrically and fits
+    the complexity exponent k of time ~ size^k to the measured times. Exits with status 1 if any function
+    scales worse than --max-exponent, the default of 1.15 allows for O(n log n) and measurement noise.
+
+    Besides realistic text and html, each function gets the adversarial shapes in SHAPES: one huge token,
+    deeply nested parentheses, long runs of punctuation, a very long URL and many URLs in one line.
+    The html cleaners also get html made of many void elements.
+    A function that turns out quadratic would take hours on the largest inputs, so a (function, shape) pair
+    stops growing once one call takes longer than --max-seconds. The exponent is fitted to the sizes measured
+    until then.
+
+    Usage: python -m benchmarks.scaling [--min-size KB] [--max-size MB] [--max-seconds S] [--only NAME ...]
+"""
+import argparse
+import math
+import sys
+import time
+
+from benchmarks.corpus import epub_html, icelandic_text
+from text_cleaner import TextCleaner
+import text_cleaner.unicode_maps as umaps
+
+KB = 1024
+MB = 1024 * KB
+# calls of a function on each input size, the fastest one counts
+MIN_CALLS = 3
+# times below this are dominated by call overhead and not used for the fit
+MIN_FIT_SECONDS = 0.001
+# the exponent is fitted to the sizes from FIT_FROM on, smaller inputs fit into the CPU caches and would make
+# linear functions look super-linear. Functions stopped before FIT_FROM are fitted to their last FIT_POINTS sizes
+FIT_FROM = MB
+FIT_POINTS = 3
+
+
+def repeat_to_size(unit: str, size: int) -> str:
+    return (unit * (size // len(unit) + 1))[:size]
+
+
+def realistic_text(size: int) -> str:
+    # generating the text is slower than cleaning it, larger inputs repeat the first MB
+    return repeat_to_size(icelandic_text(min(size, MB), seed=2), size)
+
+
+def huge_token(size: int) -> str:
+    return repeat_to_size('Þórðurßπ→Zürich3.14😎', size)
+
+
+def nested_parentheses(size: int) -> str:
+    depth = size // 8
+    return '(e. orð ' * (depth // 2) + ')' * (depth // 2)
+
+
+def punctuation_run(size: int) -> str:
+    return repeat_to_size('.,;:!? ', size)
+
+
+def long_url(size: int) -> str:
+    return 'Sjá https://www.' + repeat_to_size('frettir.is/2022/', size) + ' og meira.'
+
+
+def url_list(size: int) -> str:
+    return repeat_to_size('http://mbl.is/frett ', size)
+
+
+def html(size: int) -> str:
+    # one section of epub_html() has about 3 KB
+    return repeat_to_size(epub_html(min(max(1, size // (3 * KB)), 300), seed=2), size)
+
+
+def void_elements(size: int) -> str:
+    # void elements without a closing slash are remembered by the stream engine until their end tag
+    return repeat_to_size('<p>orð<br/>orð<img src="a"><br></p>', size)
+
+
+SHAPES = {'text': realistic_text, 'huge token': huge_token, 'nested parentheses': nested_parentheses,
+          'punctuation run': punctuation_run, 'long url': long_url, 'url list': url_list}
+
+
+def functions() -> dict:
+    """
+    Return the functions to measure and the shapes of their input, by name.
+    """
+    from text_cleaner import clean_html
+    cleaner = TextCleaner(replacement_dict=umaps.replacement_dictionary, post_dict=umaps.post_dict_lookup)
+    html_cleaner = clean_html.HtmlCleaner()
+    text_shapes = dict(SHAPES)
+    html_shapes = dict(SHAPES, html=html)
+    html_shapes['void elements'] = void_elements
+    return {
+        'TextCleaner.clean': (cleaner.clean, text_shapes),
+        'TextCleaner.clean_many': (lambda text: cleaner.clean_many(text.splitlines() or [text]), text_shapes),
+        'TextCleaner.process_emojis': (cleaner.process_emojis, text_shapes),
+        'TextCleaner.text_to_tokens': (cleaner.text_to_tokens, text_shapes),
+        'TextCleaner.clean_tokens': (cleaner.clean_tokens, text_shapes),
+        'TextCleaner.validate_characters': (cleaner.validate_characters, text_shapes),
+        'TextCleaner.finish_cleaning': (cleaner.finish_cleaning, text_shapes),
+        'TextCleaner.remove_consecutive_punctuation': (cleaner.remove_consecutive_punctuation, text_shapes),
+        'HtmlCleaner.clean_html': (html_cleaner.clean_html, html_shapes),
+        'HtmlCleaner.clean_html stream': (clean_html.HtmlCleaner(engine='stream').clean_html, html_shapes),
+        'clean_html.tidy_up_text_format': (clean_html.tidy_up_text_format, text_shapes),
+        'clean_html.remove_consecutive_punct_marks': (clean_html.remove_consecutive_punct_marks, text_shapes),
+        'clean_html.remove_whitespace_before_punctuation': (clean_html.remove_whitespace_before_punctuation,
+                                                           text_shapes),
+        'clean_html.clean_up_urls': (clean_html.clean_up_urls, text_shapes),
+    }
+
+
+def time_call(function, text: str) -> float:
+    """
+    Return the time of one call of function(text), the fastest of at least MIN_CALLS calls taking less than
+    a second, or of as many calls as fit into 0.2 seconds for fast functions.
+    """
+    best = float('inf')
+    total = 0
+    calls = 0
+    while total < 0.2 or (calls < MIN_CALLS and best < 1):
+        start = time.perf_counter()
+        function(text)
+        elapsed = time.perf_counter() - start
+        best = min(best, elapsed)
+        total += elapsed
+        calls += 1
+    return best
+
+
+def fit_exponent(points: list):
+    """
+    Return the slope of the least squares line through the (size, seconds) 'points' from FIT_FROM on, or else
+    the last FIT_POINTS of them, on a log-log scale. Returns None if there are less than three points taking
+    at least MIN_FIT_SECONDS.
+    """
+    points = [(size, seconds) for size, seconds in points if seconds >= MIN_FIT_SECONDS]
+    large = [(size, seconds) for size, seconds in points if size >= FIT_FROM]
+    if len(large) < 3:
+        large = points[-FIT_POINTS:]
+    points = [(math.log(size), math.log(seconds)) for size, seconds in large]
+    if len(points) < 3:
+        return None
+    mean_x = sum(x for x, _ in points) / len(points)
+    mean_y = sum(y for _, y in points) / len(points)
+    return sum((x - mean_x) * (y - mean_y) for x, y in points) / sum((x - mean_x) ** 2 for x, _ in points)
+
+
+def measure(function, shape, sizes: list, max_seconds: float) -> list:
+    points = []
+    for size in sizes:
+        text = shape(size)
+        seconds = time_call(function, text)
+        points.append((len(text), seconds))
+        if seconds > max_seconds:
+            break
+    return points
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--min-size', type=float, default=1, help="Size of the smallest input in KB")
+    parser.add_argument('--max-size', type=float, default=64, help="Size of the largest input in MB")
+    parser.add_argument('--factor', type=float, default=4, help="Growth factor of the input size")
+    parser.add_argument('--max-seconds', type=float, default=5,
+                        help="Stop growing the input of a function once one call takes longer")
+    parser.add_argument('--max-exponent', type=float, default=1.15, help="Largest allowed complexity exponent")
+    parser.add_argument('--only', nargs='+', help="Only measure functions whose name contains one of these")
+    args = parser.parse_args()
+
+    sizes = []
+    size = args.min_size * KB
+    while size < args.max_size * MB:
+        sizes.append(int(size))
+        size *= args.factor
+    sizes.append(int(args.max_size * MB))
+
+    failures = []
+    print('{:48s} {:20s} {:>9s} {:>11s} {:>9s}'.format('function', 'input', 'exponent', 'largest KB', 'seconds'))
+    for name, (function, shapes) in functions().items():
+        if args.only and not any(part in name for part in args.only):
+            continue
+        for shape_name, shape in shapes.items():
+            points = measure(function, shape, sizes, args.max_seconds)
+            exponent = fit_exponent(points)
+            status = ''
+            if exponent is not None and exponent > args.max_exponent:
+                failures.append((name, shape_name, exponent))
+                status = '  SUPER-LINEAR'
+            print('{:48s} {:20s} {:>9s} {:11.0f} {:9.3f}{}'.format(
+                name, shape_name, '-' if exponent is None else '{:.2f}'.format(exponent), points[-1][0] / KB,
+                points[-1][1], status), flush=True)
+
+    if failures:
+        print('{} function(s) scale worse than size^{}:'.format(len(failures), args.max_exponent))
+        for name, shape_name, exponent in failures:
+            print('    {} on {}: size^{:.2f}'.format(name, shape_name, exponent))
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,178 @@
+"""
+    Micro-benchmarks of each stage of TextCleaner and HtmlCleaner on synthetic Icelandic text and EPUB-like html,
+    see corpus.py. Only needs the standard library (and bs4 for the html stages), so it runs offline.
+
+    Each benchmark runs its stage over the same input 'repeat' times and reports the fastest and the median run.
+    Stages that change their input, like clean_html_tables(), get a fresh copy of it before each run, which is
+    not timed.
+
+    Usage:
+        # run all benchmarks, or those whose name contains one of the --only strings, and write the results as JSON
+        python -m benchmarks.suite run [--output results.json] [--repeat N] [--scale F] [--only NAME ...]
+
+        # store a baseline, then check later runs against it. Exits with status 1 if a benchmark got slower
+        # than the baseline by more than --threshold (a fraction of the baseline time)
+        python -m benchmarks.suite run --output baseline.json
+        python -m benchmarks.suite compare baseline.json [--current results.json] [--threshold 0.2]
+"""
+import argparse
+import json
+import platform
+import statistics
+import sys
+import time
+
+from benchmarks.corpus import epub_html, icelandic_lines
+import text_cleaner
+from text_cleaner import TextCleaner
+import text_cleaner.unicode_maps as umaps
+
+# number of lines and html sections at --scale 1
+LINES = 2000
+SECTIONS = 40
+
+
+class Benchmark:
+    """
+    A stage to time: 'run' is called with the return value of 'setup', which is called before each run.
+    'items' is the number of items (lines, tokens, documents) one run processes, 'chars' their total length.
+    """
+
+    def __init__(self, name: str, run, setup=None, items=1, chars=0):
+        self.name = name
+        self.run = run
+        self.setup = setup or (lambda: None)
+        self.items = items
+        self.chars = chars
+
+    def measure(self, repeat: int) -> dict:
+        times = []
+        for _ in range(repeat):
+            arg = self.setup()
+            start = time.perf_counter()
+            self.run(arg)
+            times.append(time.perf_counter() - start)
+        best = min(times)
+        return {'min': best, 'median': statistics.median(times), 'repeat': repeat, 'items': self.items,
+                'chars': self.chars, 'chars_per_second': self.chars / best if best and self.chars else None}
+
+
+def text_benchmarks(scale: float) -> list:
+    cleaner = TextCleaner(replacement_dict=umaps.replacement_dictionary, post_dict=umaps.post_dict_lookup)
+    lines = icelandic_lines(max(1, int(LINES * scale)), seed=1)
+    tokens = [token for line in lines for token in line.split()]
+    chars = sum(len(line) for line in lines)
+    token_chars = sum(len(token) for token in tokens)
+    return [
+        Benchmark('TextCleaner.process_emojis', lambda _: [cleaner.process_emojis(line) for line in lines],
+                  items=len(lines), chars=chars),
+        Benchmark('TextCleaner.text_to_tokens', lambda _: [cleaner.text_to_tokens(line) for line in lines],
+                  items=len(lines), chars=chars),
+        Benchmark('TextCleaner.validate_characters', lambda _: [cleaner.validate_characters(token) for token in tokens],
+                  items=len(tokens), chars=token_chars),
+        Benchmark('TextCleaner.remove_consecutive_punctuation',
+                  lambda _: [cleaner.remove_consecutive_punctuation(line) for line in lines],
+                  items=len(lines), chars=chars),
+        Benchmark('TextCleaner.clean', lambda _: [cleaner.clean(line) for line in lines],
+                  items=len(lines), chars=chars),
+    ]
+
+
+def html_benchmarks(scale: float) -> list:
+    from text_cleaner import clean_html
+    html_cleaner = clean_html.HtmlCleaner()
+    html = epub_html(max(1, int(SECTIONS * scale)), seed=1)
+    text = html_cleaner.extract_html_from_string(html).get_text()
+    return [
+        Benchmark('HtmlCleaner.clean_html', lambda _: html_cleaner.clean_html(html), chars=len(html)),
+        Benchmark('HtmlCleaner.extract_html_from_string', lambda _: html_cleaner.extract_html_from_string(html),
+                  chars=len(html)),
+        Benchmark('HtmlCleaner.clean_html_tables', html_cleaner.clean_html_tables,
+                  setup=lambda: html_cleaner.extract_html_from_string(html), chars=len(html)),
+        Benchmark('HtmlCleaner.append_punctuation_to_tag_content', html_cleaner.append_punctuation_to_tag_content,
+                  setup=lambda: html_cleaner.extract_html_from_string(html), chars=len(html)),
+        Benchmark('clean_html.tidy_up_text_format', lambda _: clean_html.tidy_up_text_format(text), chars=len(text)),
+    ]
+
+
+def run_benchmarks(repeat: int, scale: float, only=None) -> dict:
+    """
+    Run the benchmarks, all of them or those whose name contains one of the strings in 'only'.
+    Returns the results with a description of the environment, as written by 'run'.
+    """
+    results = {}
+    for benchmark in text_benchmarks(scale) + html_benchmarks(scale):
+        if only and not any(part in benchmark.name for part in only):
+            continue
+        results[benchmark.name] = benchmark.measure(repeat)
+        print('{:50s} {:10.2f} ms'.format(benchmark.name, results[benchmark.name]['min'] * 1000), file=sys.stderr)
+    return {'text_cleaner': text_cleaner.__version__, 'python': platform.python_version(),
+            'platform': platform.platform(), 'repeat': repeat, 'scale': scale, 'results': results}
+
+
+def compare(baseline: dict, current: dict, threshold: float) -> list:
+    """
+    Print the time of each benchmark in 'current' relative to 'baseline', return the names of the benchmarks
+    that are slower than the baseline by more than 'threshold'.
+    """
+    if (baseline.get('scale'), baseline.get('repeat')) != (current.get('scale'), current.get('repeat')):
+        print('warning: baseline and current results were run with different --scale or --repeat')
+    regressions = []
+    print('{:50s} {:>12s} {:>12s} {:>8s}'.format('benchmark', 'baseline ms', 'current ms', 'ratio'))
+    for name, result in current['results'].items():
+        if name not in baseline['results']:
+            print('{:50s} {:>12s} {:12.2f}'.format(name, 'new', result['min'] * 1000))
+            continue
+        base_time = baseline['results'][name]['min']
+        ratio = result['min'] / base_time
+        flag = ''
+        if ratio > 1 + threshold:
+            regressions.append(name)
+            flag = '  REGRESSION'
+        print('{:50s} {:12.2f} {:12.2f} {:7.2f}x{}'.format(name, base_time * 1000, result['min'] * 1000, ratio, flag))
+    return regressions
+
+
+def parse_arguments():
+    parser = argparse.ArgumentParser()
+    commands = parser.add_subparsers(dest='command')
+    commands.required = True
+    run_parser = commands.add_parser('run', help="Run the benchmarks and write the results as JSON")
+    run_parser.add_argument('--output', '-o', help="File to write the results to, default is stdout")
+    compare_parser = commands.add_parser('compare', help="Compare results to a baseline")
+    compare_parser.add_argument('baseline', help="Results written by 'run'")
+    compare_parser.add_argument('--current', help="Results written by 'run', default is to run the benchmarks now")
+    compare_parser.add_argument('--threshold', type=float, default=0.2,
+                                help="Allowed slowdown as a fraction of the baseline time, default is 0.2")
+    for command_parser in (run_parser, compare_parser):
+        command_parser.add_argument('--repeat', type=int, default=5, help="Number of runs of each benchmark")
+        command_parser.add_argument('--scale', type=float, default=1.0, help="Factor for the size of the input")
+        command_parser.add_argument('--only', nargs='+', help="Only run benchmarks whose name contains one of these")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_arguments()
+    if args.command == 'run':
+        results = run_benchmarks(args.repeat, args.scale, args.only)
+        if args.output:
+            with open(args.output, 'w') as f:
+                json.dump(results, f, indent=2)
+        else:
+            json.dump(results, sys.stdout, indent=2)
+        return
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    if args.current:
+        with open(args.current) as f:
+            current = json.load(f)
+    else:
+        current = run_benchmarks(args.repeat, args.scale, args.only)
+    regressions = compare(baseline, current, args.threshold)
+    if regressions:
+        print('{} benchmark(s) slower than the baseline: {}'.format(len(regressions), ', '.join(regressions)))
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -7,12 +7,13 @@ setup(
 	author='Grammatek ehf',
 	author_email='info@grammatek.com',
 	url='https://github.com/grammatek/text-cleaner',
-	packages=find_packages(),
+	packages=find_packages(exclude=['benchmarks', 'benchmarks.*']),
+	package_data={'text_cleaner': ['emoji_dictionary.bin']},
 	install_requires=[
 		'setuptools',
 		'bs4'
 	],
-	python_requires='>=3.5',
+	python_requires='>=3.7',
 	entry_points={
 			'console_scripts': [
 				'text_cleaner=text_cleaner.clean:main'
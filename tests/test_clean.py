@@ -1,6 +1,14 @@
 # This Python file uses the following encoding: utf-8
+import hashlib
+import io
+import json
+import subprocess
+import sys
+import time
+import pytest
 from text_cleaner import *
 import text_cleaner.unicode_maps as umaps
+from text_cleaner import emoji_dictionary, emoji_store
 
 
 def test_default_clean():
@@ -95,3 +103,229 @@ def test_replace_character():
     assert cleaner.clean("aábdð") == "kbdeéfghi"
     assert cleaner.clean("abcdefghijklmnopqrstuvwxyz") == "kbcdegikos"
 
+
+def test_emoji_sequences():
+    cleaner = TextCleaner(replacement_dict=umaps.replacement_dictionary, post_dict=umaps.post_dict_lookup, describe_emojis=True)
+    # the longest sequence wins over its parts
+    assert cleaner.replace_emojis("👍🏽") == "thumbs up: medium skin tone"
+    assert cleaner.replace_emojis("🇮🇸 og 👍") == "flag: Iceland og thumbs up"
+    assert cleaner.replace_emojis("🔥🔥", replacement='.') == ".."
+    cleaner = TextCleaner(replacement_dict=umaps.replacement_dictionary, post_dict=umaps.post_dict_lookup, preserve_strings=['🔥'])
+    assert cleaner.replace_emojis("🔥📌🔥", replacement='.') == "🔥.🔥"
+
+def test_translation_table():
+    cleaner = TextCleaner(replacement_dict=umaps.replacement_dictionary, post_dict=umaps.post_dict_lookup)
+    # replacements are not cleaned again by the rules of the remaining characters
+    assert cleaner.validate_characters("οc").strip() == "omicron"
+    assert cleaner.validate_characters("ßøx×").strip() == "ssöx"
+    cleaner.update_replacement_dictionary({'x': 'ks'})
+    assert cleaner.validate_characters("ßøx×").strip() == "ssöks"
+
+def test_tokenizer_scaling():
+    assert TextCleaner.text_to_tokens("raki (e. relative humidity) er  hár") == \
+        ['raki', '(e. relative humidity)', 'er', '', 'hár']
+    # without parentheses, the time needed has to grow linearly with the size of the text
+    sentence = "Hann Bubbi söng afmælissönginn fyrir Jón og Gunnu. "
+    timings = []
+    for size in (1 << 18, 1 << 22):
+        text = sentence * (size // len(sentence))
+        start = time.perf_counter()
+        tokens = TextCleaner.text_to_tokens(text)
+        timings.append(time.perf_counter() - start)
+        assert len(tokens) == text.count(' ') + 1
+    # 16 times the input, allow for some noise but not for quadratic growth (256 times)
+    assert timings[1] < 48 * timings[0]
+
+def test_clean_many():
+    cleaner = TextCleaner(replacement_dict=umaps.replacement_dictionary, post_dict=umaps.post_dict_lookup)
+    texts = ["π námundast í 3.14", "📌 red pin.", ", ? byrjar á greinarmerkjum", "", "  ", "endar á emoji 🇮🇸",
+             "raki (e. humidity", ") er hár", "Græn­lands­haf snemma í morg­un.", "ß\x00Ø"]
+    assert cleaner.clean_many(texts) == [cleaner.clean(text) for text in texts]
+    assert cleaner.clean_many(iter(texts[:3])) == [cleaner.clean(text) for text in texts[:3]]
+    assert cleaner.clean_many([]) == []
+
+def test_read_lines():
+    content = "fyrsta lína\n\nönnur þriðja\x0cfjórða\nsíðasta"
+    assert list(read_lines(io.StringIO(content))) == content.splitlines()
+    assert list(read_lines(io.StringIO(""))) == []
+
+def test_token_cache():
+    cleaner = TextCleaner(replacement_dict=umaps.replacement_dictionary, post_dict=umaps.post_dict_lookup,
+                          token_cache_size=2)
+    assert cleaner.clean("ß ß Ø ß") == "ss ss Ö ss"
+    info = cleaner.token_cache_info()
+    assert (info.hits, info.misses, info.currsize) == (2, 2, 2)
+    # the cache is cleared when the replacements change
+    cleaner.update_replacement_dictionary({'ß': 'sz'})
+    assert cleaner.token_cache_info().currsize == 0
+    assert cleaner.clean("ß ß") == "sz sz"
+    cleaner.clear_token_cache()
+    assert cleaner.token_cache_info().currsize == 0
+    assert TextCleaner().token_cache_info() is None
+
+def test_valid_characters():
+    cleaner = TextCleaner(replacement_dict=umaps.replacement_dictionary, post_dict=umaps.post_dict_lookup)
+    assert cleaner.valid_text.fullmatch("Þórður söng 12 lög, á Akureyri.\t")
+    assert not cleaner.valid_text.fullmatch("Þórður söng 👍")
+    assert not cleaner.valid_token.fullmatch("Zürich")
+    assert cleaner.clean("Þórður  söng 12 lög ,. á Akureyri.") == "Þórður söng 12 lög , á Akureyri."
+    # characters with replacements are not valid
+    cleaner.update_replacement_dictionary({'a': 'k'})
+    assert not cleaner.valid_token.fullmatch("akureyri")
+    assert cleaner.clean("Akureyri") == "Akureyri"
+    assert cleaner.clean("akureyri") == "kkureyri"
+
+def test_emoji_candidates():
+    cleaner = TextCleaner()
+    assert not cleaner.emoji_matcher.may_contain_emoji("Árið 2022 voru 3 # og * í textanum")
+    assert cleaner.emoji_matcher.may_contain_emoji("keycap 1️⃣")
+    assert cleaner.emoji_matcher.may_contain_emoji("fáni 🇮🇸")
+    assert cleaner.process_emojis("keycap 1️⃣ # 1") == "keycap . # 1"
+    assert cleaner.process_emojis("🔥1️⃣#️⃣") == "..."
+
+def test_emoji_store():
+    # emoji_dictionary.bin has to be rebuilt after changes to emoji_dictionary.py
+    assert emoji_store.emojis() == tuple(emoji_dictionary.EMOJI_PATTERN)
+    assert emoji_store.descriptions() == emoji_dictionary.EMOJI_PATTERN
+    # the cleaner only loads the emoji data it needs
+    code = "import sys, text_cleaner; text_cleaner.TextCleaner().clean('🔥 og ß 👨‍👩‍👧'); " \
+           "assert 'text_cleaner.emoji_dictionary' not in sys.modules; " \
+           "assert text_cleaner.emoji_store.emojis.cache_info().currsize == 0; " \
+           "assert text_cleaner.emoji_store.descriptions.cache_info().currsize == 0"
+    subprocess.run([sys.executable, '-c', code], check=True)
+
+
+def test_emoji_detector():
+    detector = TextCleaner().emoji_detector
+    for emoji in emoji_dictionary.EMOJI_PATTERN:
+        assert detector.match(emoji, 0) == emoji
+    # sequences not in the emoji dictionary are still found as a whole
+    assert detector.match('👩🏿‍🦽‍➡️ og', 0) == '👩🏿‍🦽‍➡️'
+    assert detector.sub('1 #️⃣ 🇮 🏻🏻 👩‍', lambda emoji: '.') == '1 . 🇮 .. .\u200d'
+
+
+def test_shared_config():
+    cleaner = TextCleaner(replacement_dict=umaps.replacement_dictionary, post_dict=umaps.post_dict_lookup)
+    other = TextCleaner(replacement_dict=umaps.replacement_dictionary, post_dict=umaps.post_dict_lookup)
+    assert cleaner.config == other.config and hash(cleaner.config) == hash(other.config)
+    assert cleaner.tables is other.tables and cleaner.config is other.config
+    # the replacements are not copied per cleaner, the overlay is over the read-only dictionary of the shared tables
+    assert cleaner.replacement_dictionary.maps[-1] == other.replacement_dictionary.maps[-1] == \
+        cleaner.tables.replacement_dictionary
+    with pytest.raises(TypeError):
+        cleaner.replacement_dictionary.maps[-1]['ß'] = 'sz'
+    # own replacements go into the overlay, neither the parameter dictionary nor the other cleaner change
+    cleaner.update_replacement_dictionary({'ß': 'sz'})
+    assert 'ß' not in umaps.replacement_dictionary
+    assert cleaner.replacement_dictionary.maps[0] == {'ß': 'sz'}
+    assert cleaner.tables is not other.tables
+    assert cleaner.clean("ß") == "sz"
+    assert other.clean("ß") == "ss"
+    changed = TextCleaner(replacement_dict=umaps.replacement_dictionary, post_dict=umaps.post_dict_lookup,
+                          char_replacement={'ß': 'sz'})
+    assert changed.tables is cleaner.tables and changed.config is cleaner.config
+    # the cleaner keeps a copy of the parameter dictionary, changing it later does not change the cleaner
+    replacements = {'x': 'ks'}
+    copying = TextCleaner(replacement_dict=replacements)
+    replacements['x'] = 'z'
+    assert copying.replacement_dictionary['x'] == 'ks' and copying.clean('x') == 'ks'
+    copying.update_replacement_dictionary({'ß': 'sz'})
+    assert copying.clean('x') == 'ks'
+
+
+def test_compiled_snapshot(tmp_path, monkeypatch):
+    import text_cleaner
+    path = str(tmp_path / 'cleaner.snapshot')
+    cleaner = TextCleaner(replacement_dict=umaps.replacement_dictionary, post_dict=umaps.post_dict_lookup,
+                          char_replacement={'x': 'ks'}, describe_emojis=True, token_cache_size=100)
+    cleaner.save_compiled(path)
+    loaded = TextCleaner.load_compiled(path)
+    assert loaded.config == cleaner.config
+    assert loaded.describe_emojis and loaded.token_cache_info().maxsize == 100
+    text = "Þetta er prófun 🎉 með ß og x"
+    assert loaded.clean(text) == cleaner.clean(text)
+    # a snapshot of another version is not loaded
+    monkeypatch.setattr(text_cleaner, '__version__', '0.0.0')
+    with pytest.raises(ValueError):
+        TextCleaner.load_compiled(path)
+    (tmp_path / 'other').write_bytes(b'not a snapshot')
+    with pytest.raises(ValueError):
+        TextCleaner.load_compiled(str(tmp_path / 'other'))
+
+
+def test_clean_stats():
+    text = "Hann Bubbi söng 🎤 afmælißønginn fyrir π → C++ www.mbl.is og Łódź 😎."
+    cleaner = TextCleaner(replacement_dict=umaps.replacement_dictionary, post_dict=umaps.post_dict_lookup,
+                          preserve_strings=['C++'])
+    result = cleaner.clean_with_stats(text)
+    assert result.text == cleaner.clean(text)
+    stats = result.stats
+    assert stats.emojis_replaced == 2
+    assert stats.tokens_preserved == 1 and stats.urls_kept == 1
+    assert stats.chars_replaced == 4 and stats.chars_post_replaced == 2
+    assert stats.calls['finish_cleaning'] == 1 and stats.total_time > 0
+    # the callback gets the statistics of each text, also in batches
+    collected = []
+    cleaner = TextCleaner(replacement_dict=umaps.replacement_dictionary, post_dict=umaps.post_dict_lookup,
+                          preserve_strings=['C++'], stats_callback=lambda text, stats: collected.append(stats))
+    assert cleaner.clean(text) == result.text
+    assert cleaner.clean_many([text, "Já."]) == [result.text, "Já."]
+    assert len(collected) == 3
+    total = CleanStats()
+    for stats in collected:
+        total.add(stats)
+    assert total.emojis_replaced == 4 and total.calls['valid_text'] == 5
+
+
+def test_cli_reports(tmp_path):
+    infile = tmp_path / 'in.txt'
+    infile.write_text("Hann Bubbi söng 🎤 afmælißønginn.\n" * 3000)
+    command = [sys.executable, '-c', 'from text_cleaner.clean import main; main()', '-i', str(infile)]
+    plain = subprocess.run(command, check=True, capture_output=True, text=True)
+    trace = tmp_path / 'trace.json'
+    reports = {}
+    for options in (['--profile'], ['--mem-report', '--trace-out', str(trace)], ['--trace-out', str(trace), '-j', '2']):
+        reported = subprocess.run(command + options, check=True, capture_output=True, text=True)
+        assert reported.stdout == plain.stdout
+        reports[options[0]] = reported.stderr
+    assert 'function calls' in reports['--profile']
+    assert 'peak KiB' in reports['--mem-report'] and 'validate_characters' in reports['--mem-report']
+    # the text after --profile is the input, not the sort order
+    profiled = subprocess.run(command[:3] + ['--profile', '--profile-sort', 'tottime', 'Já 🎤'],
+                              check=True, capture_output=True, text=True)
+    assert profiled.stdout.splitlines()[0] == TextCleaner().clean('Já 🎤')
+    assert 'Ordered by: internal time' in profiled.stderr
+    # the trace of the parallel run, the chunks are cleaned in the worker processes
+    events = json.loads(trace.read_text())['traceEvents']
+    assert len([event for event in events if event['name'].startswith('chunk ')]) == 3
+    assert {'clean', 'process_emojis', 'validate_characters'} <= {event['name'] for event in events}
+
+
+def test_slow_log(tmp_path, caplog):
+    slow_log = tmp_path / 'slow.jsonl'
+    cleaner = TextCleaner(replacement_dict=umaps.replacement_dictionary, post_dict=umaps.post_dict_lookup,
+                          slow_threshold=0.05, slow_log=str(slow_log))
+    cleaned = []
+    process_emojis = cleaner.process_emojis
+
+    def record_process_emojis(text, *args):
+        cleaned.append(text)
+        return process_emojis(text, *args)
+    cleaner.process_emojis = record_process_emojis
+    slow = 'Þórðurßπ→😎' * 50000
+    assert cleaner.clean_many(["Já.", slow]) == TextCleaner(
+        replacement_dict=umaps.replacement_dictionary, post_dict=umaps.post_dict_lookup).clean_many(["Já.", slow])
+    # the stage times of the slow input are those of its cleaning, it is not cleaned again for the log
+    assert cleaned.count(slow) == 1
+    records = [json.loads(line) for line in slow_log.read_text().splitlines()]
+    assert len(records) == 1
+    record = records[0]
+    assert record['length'] == len(slow) and record['sha1'] == hashlib.sha1(slow.encode()).hexdigest()
+    assert record['prefix'] == slow[:80] and record['seconds'] > 0.05
+    assert record['times']['validate_characters'] > 0 and record['calls']['validate_characters'] == 1
+    assert record['emojis_replaced'] == record['chars_replaced'] == 0
+    # without a file, slow inputs are logged as warnings
+    cleaner = TextCleaner(slow_threshold=0.0)
+    cleaner.clean("Já")
+    assert json.loads(caplog.records[-1].getMessage())['prefix'] == "Já"
+    assert caplog.records[-1].name == 'text_cleaner.slow_inputs'
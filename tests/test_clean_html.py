@@ -1,4 +1,9 @@
 # This Python file uses the following encoding: utf-8
+import io
+import subprocess
+import sys
+import time
+import pytest
 from text_cleaner import *
 
 
@@ -34,3 +39,153 @@ def get_html_string():
                '(e. </span><em><span id="qitl_0596" class="sentence">sense of coherence).</span></em>' \
                '<span id="qitl_0597" class="sentence"> Sigrún Gunnarsdóttir hefur íslenskað skilgreiningu hugtaksins ' \
                'um tilfinningu fyrir samhengi í lífinu á eftirfarandi hátt: </span></p>'
+
+
+def test_lazy_import():
+    # BeautifulSoup is only imported when the html cleaning is used
+    code = "import sys, text_cleaner; assert 'bs4' not in sys.modules; text_cleaner.HtmlCleaner; assert 'bs4' in sys.modules"
+    subprocess.run([sys.executable, '-c', code], check=True)
+    code = "import text_cleaner; assert text_cleaner.clean_html.HtmlCleaner is text_cleaner.HtmlCleaner"
+    subprocess.run([sys.executable, '-c', code], check=True)
+    import text_cleaner
+    assert 'json' not in text_cleaner.__all__ and 'TextCleaner' in text_cleaner.__all__
+
+
+def test_clean_up_urls():
+    assert clean_up_urls("engin slóð. hér") == "engin slóð. hér"
+    # one long line without a match has to take linear time, the regex took quadratic time
+    timings = []
+    for size in (1 << 16, 1 << 20):
+        text = "Sjá https://www." + "frettir.is/2022/" * (size // 16) + " og meira."
+        start = time.perf_counter()
+        assert clean_up_urls(text) == text
+        timings.append(time.perf_counter() - start)
+    # 16 times the input, allow for some noise but not for quadratic growth (256 times)
+    assert timings[1] < 48 * timings[0]
+
+
+@pytest.mark.xfail(reason="clean_up_urls() keeps the output of the regex of earlier versions, which replaces the "
+                          "text after a url up to the last full-stop/comma of the line")
+def test_clean_up_urls_keeps_text():
+    assert "og meira" in clean_up_urls("www.mbl.is, og meira. ok")
+
+
+def test_tag_replacements():
+    html_cleaner = HtmlCleaner()
+    soup = html_cleaner.extract_html_from_string('<ul><li><p>eitt</p></li><li>tvö<br/></li></ul><a>hlekkur</a>')
+    html_cleaner.append_punctuation_to_tag_content(soup)
+    assert str(soup) == '<ul><li><p>eitt . </p> . </li><li>tvö<br> . </br> . </li> . </ul><a>hlekkur  </a>'
+    html_cleaner = HtmlCleaner(tag_replacements={'p': '!'})
+    soup = html_cleaner.append_punctuation_to_tag_content(html_cleaner.extract_html_from_string('<p>já</p><li>nei</li>'))
+    assert soup.get_text() == 'já ! nei'
+
+
+def test_clean_html_tables():
+    html_cleaner = HtmlCleaner()
+    # header rows in <thead>, a header over two columns, cells spanning rows and columns
+    html = '<table><thead><tr><th rowspan="2">Ár</th><th colspan="2">Fjöldi</th></tr>' \
+           '<tr><th>karlar</th><th>konur</th></tr></thead>' \
+           '<tbody><tr><td rowspan="2">2020</td><td>5</td><td>7</td></tr><tr><td colspan="2">12</td></tr></tbody></table>'
+    assert html_cleaner.clean_html(html) == '. Ár: 2020 . Fjöldi karlar: 5 . Fjöldi konur: 7 . Fjöldi karlar: 12 .'
+    # row headers are removed but do not prefix the cells of their column
+    html = '<table><tr><th>Ár</th><th>Fjöldi</th></tr><tr><th>2020</th><td>12</td></tr></table>'
+    assert html_cleaner.clean_html(html) == '. Fjöldi: 12 .'
+    # an empty top left corner cell does not keep the column headers from being headers
+    html = '<table><tr><td></td><th>2020</th><th>2021</th></tr><tr><th>Karlar</th><td>5</td><td>7</td></tr></table>'
+    assert html_cleaner.clean_html(html) == '. 2020: 5 . 2021: 7 .'
+    # rows in <thead> are header rows even with data cells
+    html = '<table><thead><tr><td>Ár</td><th>Fjöldi</th></tr></thead><tr><td>2020</td><td>12</td></tr></table>'
+    assert html_cleaner.clean_html(html) == 'Ár . 2020 . Fjöldi: 12 .'
+    # a nested table only gets its own headers, and is flattened once
+    html = '<table><tr><th>a</th><th>b</th></tr>' \
+           '<tr><td><table><tr><th>x</th></tr><tr><td>y</td></tr></table></td><td>z</td></tr></table>'
+    assert html_cleaner.clean_html(html) == '. a: x: y . b: z .'
+    assert HtmlCleaner(engine='stream').clean_html(html) == html_cleaner.clean_html(html)
+
+
+def get_epub_document():
+    return '<?xml version="1.0" encoding="utf-8"?>\n<!DOCTYPE html>\n' \
+           '<html xmlns="http://www.w3.org/1999/xhtml" xmlns:epub="http://www.idpf.org/2007/ops"><head>' \
+           '<title>Kafli 1</title></head><body><div class="content-text">' \
+           '<h1 id="h1">1. kafli</h1><h2>Upphafið</h2>' + get_html_string() + \
+           '<p>Sjá nánar á https://www.ruv.is/frettir. Og <a href="#n1">hér</a><br/>líka.</p>' \
+           '<ul><li>Fyrsta atriði</li><li><strong>Annað</strong> atriði</li></ul>' \
+           '<table><thead><tr><th>Ár</th><th>Fjöldi</th></tr></thead>' \
+           '<tbody><tr><td>2020</td><td>12</td></tr><tr><td>2021</td><td>15</td></tr></tbody></table>' \
+           '<dl><dt>Orð</dt><dd>Skýring &amp; dæmi</dd></dl><hr/><p>Endir – búið…</p></div></body></html>'
+
+
+@pytest.mark.parametrize('parser', ['lxml', 'html5lib'])
+def test_parsers(parser, tmp_path):
+    pytest.importorskip(parser)
+    default_cleaner = HtmlCleaner()
+    cleaner = HtmlCleaner(parser=parser)
+    assert cleaner.parser == parser
+    for html in (get_html_string(), get_epub_document()):
+        assert cleaner.clean_html(html) == default_cleaner.clean_html(html)
+    html_file = tmp_path / 'kafli.xhtml'
+    html_file.write_text(get_epub_document(), encoding='utf-8')
+    assert cleaner.clean_html(str(html_file), from_file=True) == default_cleaner.clean_html(str(html_file), from_file=True)
+
+
+def test_parser_fallback(caplog, monkeypatch):
+    from text_cleaner import clean_html
+    assert HtmlCleaner(parser='auto').parser in ('lxml', 'html.parser')
+    monkeypatch.setattr(clean_html, 'PARSERS', clean_html.PARSERS + ('not-installed',))
+    assert HtmlCleaner(parser='not-installed').parser == 'html.parser'
+    assert "'not-installed' is not installed" in caplog.text
+    with pytest.raises(ValueError):
+        HtmlCleaner(parser='xml')
+
+
+def test_extract_html_from_file(tmp_path):
+    html_file = tmp_path / 'kafli.xhtml'
+    navigation = '<nav><ol><li><a href="kafli2.xhtml">2. kafli</a></li></ol></nav><script>var x = 1;</script>'
+    html_file.write_text(get_epub_document().replace('<body>', '<body>' + navigation), encoding='utf-8')
+    html_cleaner = HtmlCleaner()
+    content = html_cleaner.extract_html_from_file(str(html_file))
+    assert content['class'] == ['content-text'] and content.h1.get_text() == '1. kafli'
+    # only the content is parsed
+    assert content.parent.find('nav') is None and content.parent.find('title') is None
+    text = html_cleaner.clean_html(str(html_file), from_file=True)
+    assert text == html_cleaner.clean_html(str(content))
+    assert '2. kafli' not in text
+
+
+def test_stream_engine(tmp_path):
+    soup_cleaner = HtmlCleaner()
+    stream_cleaner = HtmlCleaner(engine='stream')
+    documents = [get_html_string(), get_epub_document(),
+                 # tables with headers after the rows, nested tables and headers in headers
+                 '<table><tr><td>1</td><td>2</td></tr><tr><th>a</th><th>b<th>c</th></th></tr></table>',
+                 '<table><tr><th>a</th></tr><tr><td><table><tr><th>x</th></tr><tr><td>y</td></tr></table></td></tr>'
+                 '</table><td>utan töflu</td>',
+                 '<table><tbody><tr><th colspan="2">a</th></tr><tr><td rowspan="0">1</td><td colspan="x">2</td></tr>'
+                 '<tr><td>3</td></tr></tbody><tfoot><tr><th>b</th><td>4</td></tr></tfoot></table>',
+                 # end tags closing other tags, void elements and their end tags, text that is not content
+                 '<ul><li>a<p>b</ul>c</p><br>d</br><p/>e<hr/><script>var x = "<p>";</script><style>p {}</style>',
+                 '<template><p>sniðmát</p></template><pre>  \n </pre><p>  \n </p><!-- athugasemd --><![CDATA[gögn]]>',
+                 '<p>&amp; &nbsp;&#8211;&#x201C;&#150;&foo; &#0;</p><p>ó&shy;lokið']
+    for html in documents:
+        assert stream_cleaner.clean_html(html) == soup_cleaner.clean_html(html)
+    html_file = tmp_path / 'kafli.xhtml'
+    html_file.write_text(get_epub_document().replace('<body>', '<body><nav><p>2. kafli</p></nav>'), encoding='utf-8')
+    assert stream_cleaner.clean_html(str(html_file), from_file=True) == \
+        soup_cleaner.clean_html(str(html_file), from_file=True)
+    html_file.write_text('<div class="annað">texti</div>', encoding='utf-8')
+    with pytest.raises(ValueError):
+        stream_cleaner.clean_html(str(html_file), from_file=True)
+
+
+def test_stream_engine_parts():
+    from text_cleaner import html_stream
+    suffixes = HtmlCleaner().tag_suffixes()
+    # parts end after a '>', so references like '&amp' without a ';' are not split from the character ending them
+    # without a '>' in several reads, parts end after a character ending references, like the space
+    for html in (get_epub_document(), '<p>a &amp-->b &#8211;</p><br>c &lt<br/>',
+                 '<p>' + 'orð &amp-&amp; ' * 500 + '</p>'):
+        whole = html_stream.extract_text([html], suffixes)
+        for size in (16, 100):
+            parts = list(html_stream.read_html(io.StringIO(html), size))
+            assert max(map(len, parts)) <= (html_stream.MAX_PENDING_READS + 1) * size
+            assert html_stream.extract_text(parts, suffixes) == whole
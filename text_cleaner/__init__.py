@@ -1,2 +1,25 @@
-from .clean import *
-from .clean_html import *
\ No newline at end of file
+__version__ = '0.1.0'
+
+import importlib as _importlib
+
+from .clean import (TextCleaner, CleanResult, CleanStats, clean_in_parallel, read_lines, COMMON_PUNCT,
+                    URL_PATTERN, EN_LABEL, SSML_LANG_START, SSML_LANG_END)
+
+# clean_html depends on BeautifulSoup, the module and its names are imported on first use, see __getattr__()
+_HTML_NAMES = ('HtmlCleaner', 'tidy_up_text_format', 'remove_whitespace_before_punctuation',
+               'remove_consecutive_punct_marks', 'clean_up_urls', 'PUNCTUATION', 'TOP_TABLE_ELEM', 'TABLE_ROW',
+               'TABLE_HEADER', 'TABLE_CELL')
+
+__all__ = ['TextCleaner', 'CleanResult', 'CleanStats', 'clean_in_parallel', 'read_lines', 'COMMON_PUNCT',
+           'URL_PATTERN', 'EN_LABEL', 'SSML_LANG_START', 'SSML_LANG_END'] + list(_HTML_NAMES)
+
+
+def __getattr__(name):
+    if name == 'clean_html' or name in _HTML_NAMES:
+        clean_html = _importlib.import_module('.clean_html', __name__)
+        return clean_html if name == 'clean_html' else getattr(clean_html, name)
+    raise AttributeError("module {!r} has no attribute {!r}".format(__name__, name))
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_HTML_NAMES) | {'clean_html'})
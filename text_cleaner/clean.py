@@ -15,10 +15,21 @@
 
 """
 import argparse, sys
+import collections
+import functools
+import hashlib
+import json
 import logging
 import re
+import time
+import types
+from typing import Iterable, TextIO
 from text_cleaner import constants as consts
-from text_cleaner import emoji_dictionary
+from text_cleaner import emoji_store
+from text_cleaner import cleaner_config
+from text_cleaner.clean_stats import CleanResult, CleanStats
+from text_cleaner.cleaner_config import CleanerConfig, CleanerTables
+from text_cleaner.emoji_matcher import EmojiDetector, EmojiMatcher
 
 # Common punctuation symbols, often to be ignored at start/end of tokens
 COMMON_PUNCT = ',.?!:;()'
@@ -27,13 +38,27 @@ EN_LABEL = '(e.'
 # SSML 1.1 standard
 SSML_LANG_START = '<lang xml:lang="en-GB"> '
 SSML_LANG_END = ' </lang>'
+PARENTHESES = re.compile(r'[()]')
+WHITESPACE = re.compile(r'\s')
+# whitespace runs and consecutive punctuation marks, matches only where finish_cleaning() changes the text:
+# runs of punctuation marks with optional whitespace in between, runs of whitespace or a single whitespace other than ' '
+FINISH_PATTERN = re.compile(r'([' + COMMON_PUNCT + r'])(?:\s*[' + COMMON_PUNCT + r']+)+|\s{2,}|[^\S ]')
+# joins the texts cleaned in one batch, neither whitespace nor punctuation so no cleaning step crosses it
+BATCH_SEPARATOR = '\x00'
+# number of lines a worker process cleans at a time when running with --jobs
+CHUNK_SIZE = 1000
+# inputs slower than the slow_threshold of a TextCleaner are logged here, unless it has a slow_log file
+SLOW_LOGGER = logging.getLogger('text_cleaner.slow_inputs')
+# number of characters of a slow input written to the slow log
+SLOW_PREFIX_LENGTH = 80
 
 
 class TextCleaner:
 
     def __init__(self, replacement_dict={}, post_dict={}, char_replacement={}, punct_replacement='', alphabet=[],
                  punct_set=[], preserve_strings=[], emoji_replacement='.', preserve_emojis=False, describe_emojis=False,
-                 delete_labelled_translations=False):
+                 delete_labelled_translations=False, token_cache_size=0, stats_callback=None, slow_threshold=None,
+                 slow_log=None):
 
         """
         Initializes the textCleaner, arguments offer custom handling of characters, symbols and strings.
@@ -60,25 +85,43 @@ class TextCleaner:
         :param emoji_replacement: str to replace emojis with, default is '.'. Note that 'preserve_emoji' and
                                 'describe_emojis' override this parameter!
         :param delete_labelled_translations: if True, we delete text/tokens labelled as foreign, default is False
+        :param token_cache_size: if > 0, remember the cleaned output of this many tokens in a least recently used
+                                cache, see validate_characters(). Default is 0, no cache. None means no size limit
+        :param stats_callback: if set, clean() collects statistics and calls stats_callback(text, stats) for each
+                                input text with its CleanStats, see clean_with_stats(). Default is None, no statistics
+        :param slow_threshold: if set, clean() records each input taking longer than this many seconds in the slow
+                                log, see log_slow_input(). Default is None, no slow log
+        :param slow_log: JSON lines file the slow inputs are appended to. Default is None, they are logged as
+                                warnings of the 'text_cleaner.slow_inputs' logger
 
         """
 
-        # since we might alter replacement_dictionary, make a copy of the parameter dictionary
-        self.replacement_dictionary = replacement_dict.copy()
+        self.stats_callback = stats_callback
+        self.slow_threshold = slow_threshold
+        self.slow_log = slow_log
+        # cleaned tokens, the same token is usually cleaned many times in a large text
+        if token_cache_size != 0:
+            self.token_cache = functools.lru_cache(maxsize=token_cache_size)(self.translate_token)
+        else:
+            self.token_cache = None
+        # since we might alter replacement_dictionary, our own replacements are kept in an overlay. Once the
+        # tables are compiled, the overlay is over their read-only dictionary instead of the parameter dictionary,
+        # see compile_tables()
+        self.replacement_dictionary = collections.ChainMap({}, replacement_dict)
         self.post_dict_lookup = post_dict
-        if char_replacement:
-            self.update_replacement_dictionary(char_replacement)
         if punct_set:
             self.preserved_punctuation = punct_set
         else:
             self.preserved_punctuation = consts.punctuation_marks
-        if punct_replacement:
-            punct_dict = self.create_dict(self.preserved_punctuation, punct_replacement)
-            self.update_replacement_dictionary(punct_dict)
         if alphabet:
             self.alphabet = alphabet
         else:
             self.alphabet = consts.character_alphabet
+        if char_replacement:
+            self.add_replacements(char_replacement)
+        if punct_replacement:
+            punct_dict = self.create_dict(self.preserved_punctuation, punct_replacement)
+            self.add_replacements(punct_dict)
         self.preserve_strings = preserve_strings
         self.delete_translations = delete_labelled_translations
         if preserve_emojis:
@@ -93,6 +136,62 @@ class TextCleaner:
             self.preserve_emojis = False
             self.describe_emojis = False
             self.emoji_replacement = emoji_replacement
+        self.compile_tables()
+
+    def compile_tables(self) -> None:
+        """
+        Look up the tables for the current replacement dictionaries, alphabet and punctuation, see CleanerTables.
+        Cleaners with the same configuration share their tables, they are only compiled for the first one.
+        """
+        self.config = CleanerConfig.create(self.replacement_dictionary, self.post_dict_lookup, self.alphabet,
+                                           self.preserved_punctuation)
+        self.tables = CleanerTables.for_config(self.config)
+        # the interned config and dictionary of the shared tables, not copies of them per cleaner
+        self.config = self.tables.config
+        self.replacement_dictionary = collections.ChainMap(self.replacement_dictionary.maps[0],
+                                                           types.MappingProxyType(self.tables.replacement_dictionary))
+        self.translation_table = self.tables.translation_table
+        self.valid_token = self.tables.valid_token
+        self.valid_text = self.tables.valid_text
+        self.clear_token_cache()
+
+    def save_compiled(self, path: str) -> None:
+        """
+        Save the options and compiled tables of this cleaner to the snapshot file 'path', see load_compiled()
+        """
+        cache_info = self.token_cache_info()
+        options = {'replacement_dict': dict(self.replacement_dictionary.maps[-1]),
+                   'char_replacement': dict(self.replacement_dictionary.maps[0]),
+                   'post_dict': dict(self.post_dict_lookup), 'alphabet': list(self.alphabet),
+                   'punct_set': list(self.preserved_punctuation), 'preserve_strings': list(self.preserve_strings),
+                   'emoji_replacement': self.emoji_replacement, 'preserve_emojis': self.preserve_emojis,
+                   'describe_emojis': self.describe_emojis, 'delete_labelled_translations': self.delete_translations,
+                   'token_cache_size': cache_info.maxsize if cache_info else 0,
+                   'slow_threshold': self.slow_threshold, 'slow_log': self.slow_log}
+        cleaner_config.write_snapshot(path, {'options': options, 'tables': self.tables.snapshot()})
+
+    @classmethod
+    def load_compiled(cls, path: str) -> 'TextCleaner':
+        """
+        Return a cleaner with the options saved by save_compiled() to 'path'. The tables are not compiled again.
+        Raises a ValueError if the snapshot was written by another version of text_cleaner or from other
+        replacement maps or emoji data, then create the cleaner from its options and save it again.
+        """
+        snapshot = cleaner_config.read_snapshot(path)
+        # registered for the cleaner created next, which finds them by its config
+        tables = CleanerTables.from_snapshot(snapshot['tables'])
+        cleaner = cls(**snapshot['options'])
+        if cleaner.tables is not tables:
+            raise ValueError(path + " is corrupt, its options do not match its tables")
+        return cleaner
+
+    @property
+    def emoji_detector(self) -> EmojiDetector:
+        return cleaner_config.emoji_detector()
+
+    @property
+    def emoji_matcher(self) -> EmojiMatcher:
+        return cleaner_config.emoji_matcher()
 
     @staticmethod
     def create_dict(keys_list: list, value: str) -> dict:
@@ -113,16 +212,48 @@ class TextCleaner:
         # the following regex demarks a string that starts with a punctuation mark,
         # followed by 1 or more occurrences of 0 or more whitespaces, followed by 1
         # or more punctuation marks
-        return re.sub(r'([' + COMMON_PUNCT + '])(\s*[' + COMMON_PUNCT + ']+)+', r'\1', text)
+        return re.sub(r'([' + COMMON_PUNCT + r'])(?:\s*[' + COMMON_PUNCT + ']+)+', r'\1', text)
 
     @staticmethod
     def text_to_tokens(text: str) -> list:
         """
         Splits the input text at whitespaces into tokens. Exception
-        is made within parenthesis to simplify the cleaning process.
+        is made within parenthesis to simplify the cleaning process:
+        a whitespace is not split at if the next parenthesis following
+        it is a closing one, e.g. "(e. Hello World)" is one token.
+
+        The text is processed in chunks, each ending at a parenthesis,
+        so the text is only scanned once.
         """
-        # the following regex demarks a string within parentheses (opening and closing parenthesis)
-        return re.split(r'\s(?![^(]*\))', text)
+        tokens = []
+        current_token = []
+        start = 0
+        for paren in PARENTHESES.finditer(text):
+            end = paren.end()
+            if paren.group() == ')':
+                # all whitespaces in this chunk are inside parentheses
+                current_token.append(text[start:end])
+            else:
+                current_token = TextCleaner._split_chunk(text[start:end], current_token, tokens)
+            start = end
+        current_token = TextCleaner._split_chunk(text[start:], current_token, tokens)
+        tokens.append(''.join(current_token))
+        return tokens
+
+    @staticmethod
+    def _split_chunk(chunk: str, current_token: list, tokens: list) -> list:
+        """
+        Split 'chunk' at whitespaces, the first part completes 'current_token', the last part starts a new one.
+        Completed tokens are appended to 'tokens', returns the parts of the new current token.
+        """
+        parts = WHITESPACE.split(chunk)
+        if len(parts) == 1:
+            current_token.append(chunk)
+            return current_token
+        current_token.append(parts[0])
+        tokens.append(''.join(current_token))
+        tokens.extend(parts[1:-1])
+        return [parts[-1]]
 
     @staticmethod
     def labelled_translation_to_ssml(token) -> str:
@@ -140,11 +271,151 @@ class TextCleaner:
         :param html: if True, first parse the input text as html
         :return: a cleaned version of 'text' according to init settings
         """
+        if self.stats_callback is not None or self.slow_threshold is not None:
+            return self.clean_observed(text)
+        return self.clean_stages(text)
+
+    def clean_stages(self, text: str, stats=None) -> str:
+        """
+        The stages of clean(), without slow log. If 'stats' are given, the time of each stage is added to them,
+        see clean_stages_timed()
+        """
+        if stats is not None:
+            return self.clean_stages_timed(text, stats)
+        if self.valid_text.fullmatch(text):
+            # only whitespaces and punctuation need to be handled
+            return self.finish_cleaning(text).strip()
         clean_text = self.process_emojis(text)
-        clean_text = self.text_to_tokens(clean_text)
+        clean_text = self.clean_tokens(clean_text)
+        clean_text = self.finish_cleaning(clean_text)
+
+        return clean_text.strip()
 
-        cleaned_text = ''
-        for token in clean_text:
+    def clean_stages_timed(self, text: str, stats: CleanStats) -> str:
+        """
+        The stages of clean(), adding the time of each stage to 'stats' by bare perf_counter() calls.
+        Unlike clean_with_stats(), the changes are not counted, so it is almost as fast as clean_stages().
+        """
+        start = time.perf_counter()
+        valid = self.valid_text.fullmatch(text)
+        end = time.perf_counter()
+        stats.add_time('valid_text', end - start)
+        if not valid:
+            clean_text = self.process_emojis(text)
+            start, end = end, time.perf_counter()
+            stats.add_time('process_emojis', end - start)
+            valid = self.valid_text.fullmatch(clean_text)
+            start, end = end, time.perf_counter()
+            stats.add_time('valid_text', end - start)
+            if valid:
+                text = clean_text + ' '
+            else:
+                tokens = self.text_to_tokens(clean_text)
+                start, end = end, time.perf_counter()
+                stats.add_time('text_to_tokens', end - start)
+                text = self.clean_token_sequence(tokens)
+                start, end = end, time.perf_counter()
+                stats.add_time('validate_characters', end - start, calls=len(tokens))
+        clean_text = self.finish_cleaning(text)
+        stats.add_time('finish_cleaning', time.perf_counter() - end)
+        return clean_text.strip()
+
+    def clean_observed(self, text: str) -> str:
+        """
+        clean() with a stats_callback or a slow_threshold. Without a stats_callback, only the times of the stages
+        are measured, for the slow log of the inputs slower than slow_threshold, see log_slow_input().
+        """
+        if self.stats_callback is not None:
+            result = self.clean_with_stats(text)
+            self.stats_callback(text, result.stats)
+            if self.slow_threshold is not None and result.stats.total_time > self.slow_threshold:
+                self.log_slow_input(text, result.stats.total_time, result.stats)
+            return result.text
+        stats = CleanStats()
+        start = time.perf_counter()
+        clean_text = self.clean_stages(text, stats)
+        seconds = time.perf_counter() - start
+        if seconds > self.slow_threshold:
+            self.log_slow_input(text, seconds, stats)
+        return clean_text
+
+    def log_slow_input(self, text: str, seconds: float, stats: CleanStats) -> None:
+        """
+        Write a record of the slow input 'text' to the slow log: its length, sha1 hash and first
+        SLOW_PREFIX_LENGTH characters, the time it took and the 'stats' of its cleaning.
+        """
+        record = {'length': len(text), 'sha1': hashlib.sha1(text.encode('utf-8', 'surrogatepass')).hexdigest(),
+                  'prefix': text[:SLOW_PREFIX_LENGTH], 'seconds': seconds, 'threshold': self.slow_threshold}
+        record.update(stats.as_dict())
+        line = json.dumps(record, ensure_ascii=False)
+        if self.slow_log:
+            # opened for each record, so that many processes can append to the same file
+            with open(self.slow_log, 'a', encoding='utf-8') as f:
+                f.write(line + '\n')
+        else:
+            SLOW_LOGGER.warning(line)
+
+    def clean_with_stats(self, text: str, stats=None) -> CleanResult:
+        """
+        Clean 'text' like clean(), and collect the time spent in each stage and counts of the changes made.
+        Slower than clean(), since the changes are counted character by character.
+
+        :param text: string to clean
+        :param stats: CleanStats to add the statistics of 'text' to, e.g. to sum them up for many texts.
+                      Default is a new CleanStats
+        :return: the cleaned text and its CleanStats
+        """
+        if stats is None:
+            stats = CleanStats()
+        if stats.timed('valid_text', self.valid_text.fullmatch, text):
+            clean_text = stats.timed('finish_cleaning', self.finish_cleaning, text)
+        else:
+            clean_text = stats.timed('process_emojis', self.process_emojis, text, stats)
+            clean_text = self.clean_tokens_with_stats(clean_text, stats)
+            clean_text = stats.timed('finish_cleaning', self.finish_cleaning, clean_text)
+        return CleanResult(clean_text.strip(), stats)
+
+    def clean_many(self, texts: Iterable[str]) -> list:
+        """
+        Clean each text in 'texts', the result is the same as calling clean() for each of them.
+        The emoji processing and the final whitespace and punctuation handling are done on all texts
+        at once, joined by BATCH_SEPARATOR.
+
+        :param texts: strings to clean
+        :return: a list of the cleaned texts, in the same order as 'texts'
+        """
+        texts = list(texts)
+        if not texts:
+            return []
+        if self.stats_callback is not None or self.slow_threshold is not None:
+            # statistics and times are collected per text
+            return [self.clean(text) for text in texts]
+        batch = BATCH_SEPARATOR.join(texts)
+        if batch.count(BATCH_SEPARATOR) == len(texts) - 1:
+            processed = self.process_emojis(batch).split(BATCH_SEPARATOR)
+            if len(processed) == len(texts):
+                batch = BATCH_SEPARATOR.join([self.clean_tokens(text) for text in processed])
+                if batch.count(BATCH_SEPARATOR) == len(texts) - 1:
+                    return [text.strip() for text in self.finish_cleaning(batch).split(BATCH_SEPARATOR)]
+        # the separator occurs in the input or is produced by a replacement, clean each text on its own
+        return [self.clean(text) for text in texts]
+
+    def clean_tokens(self, text: str) -> str:
+        """
+        Split 'text' into tokens and clean each token, keeping preserved strings and URLs as they are.
+        Each token in the result is followed by a space. If no character in 'text' needs cleaning,
+        'text' is returned with its whitespaces, they are normalized by finish_cleaning()
+        """
+        if self.valid_text.fullmatch(text):
+            return text + ' '
+        return self.clean_token_sequence(self.text_to_tokens(text))
+
+    def clean_token_sequence(self, tokens: list) -> str:
+        """
+        Clean each of 'tokens' as described in clean_tokens()
+        """
+        cleaned_tokens = []
+        for token in tokens:
             # TODO: only covers english text atm and assumes it's prefixed by "(e." as is by convention
             # For token based cleaning, we don't have the context for inserting opening and closing ssml-tags
             # Will be handled in the manager
@@ -153,105 +424,167 @@ class TextCleaner:
             if token in self.preserve_strings or token.strip('r'+COMMON_PUNCT) in self.preserve_strings:
                 # TODO: is this defined somewhere? Why '"()'?
                 #token = re.sub(r'["()]', ' , ', token)
-                cleaned_text += token + ' '
+                cleaned_tokens.append(token + ' ')
             elif re.match(URL_PATTERN, token):
                 # If not handled separately, the different punctuation symbols in a URL would be deleted/replaced
                 # and the token splitted. We don't want that, keep URLs as one token
                 # TODO: what about email?
-                cleaned_text += token + ' '
+                cleaned_tokens.append(token + ' ')
             else:
-                cleaned_text += self.validate_characters(token)
+                cleaned_tokens.append(self.validate_characters(token))
 
-        cleaned_text = re.sub(r'\s+', ' ', cleaned_text)
-        cleaned_text = re.sub(r'\n+', ' ', cleaned_text)
-        cleaned_text = self.remove_consecutive_punctuation(cleaned_text)
+        return ''.join(cleaned_tokens)
 
-        return cleaned_text.strip()
+    def clean_tokens_with_stats(self, text: str, stats: CleanStats) -> str:
+        """
+        Same as clean_tokens(), adding the times of text_to_tokens() and of the cleaning of the tokens and
+        the counts of preserved tokens, URLs and changed characters to 'stats'
+        """
+        if stats.timed('valid_text', self.valid_text.fullmatch, text):
+            return text + ' '
+        tokens = stats.timed('text_to_tokens', self.text_to_tokens, text)
+        cleaned_tokens, validated = stats.timed('validate_characters', self.clean_token_list, tokens, stats,
+                                                calls=len(tokens))
+        for token in validated:
+            if not self.valid_token.fullmatch(token):
+                self.count_changes(token, stats)
+        return ''.join(cleaned_tokens)
+
+    def clean_token_list(self, tokens: list, stats: CleanStats) -> tuple:
+        """
+        Clean 'tokens' with the same branches as clean_tokens(), counting preserved tokens and URLs in 'stats'.
+        Returns the cleaned tokens and the tokens that were validated.
+        """
+        cleaned_tokens = []
+        validated = []
+        for token in tokens:
+            if token in self.preserve_strings or token.strip('r'+COMMON_PUNCT) in self.preserve_strings:
+                stats.tokens_preserved += 1
+                cleaned_tokens.append(token + ' ')
+            elif re.match(URL_PATTERN, token):
+                stats.urls_kept += 1
+                cleaned_tokens.append(token + ' ')
+            else:
+                validated.append(token)
+                cleaned_tokens.append(self.validate_characters(token))
+        return cleaned_tokens, validated
+
+    def count_changes(self, token: str, stats: CleanStats) -> None:
+        """
+        Add the characters of 'token' that validate_characters() drops or replaces to 'stats'
+        """
+        for char in token:
+            output = self.translation_table[ord(char)]
+            if output == char:
+                continue
+            if not output:
+                stats.chars_dropped += 1
+            elif self.tables.replacement_dictionary.get(char):
+                stats.chars_replaced += 1
+            else:
+                stats.chars_post_replaced += 1
 
-    def process_emojis(self, text: str) -> str:
+    def finish_cleaning(self, text: str) -> str:
+        """
+        Collapse whitespaces and remove consecutive punctuation in the cleaned text, in one pass.
+        The result is the same as replacing each run of whitespace by ' ', followed by
+        remove_consecutive_punctuation().
+        """
+        return FINISH_PATTERN.sub(self._finish_match, text)
+
+    @staticmethod
+    def _finish_match(match) -> str:
+        # the first punctuation mark of a run, or a single space for whitespace
+        return match.group(1) or ' '
+
+    def process_emojis(self, text: str, stats=None) -> str:
         """
         Process emojis according to init parameters of the class. We might not do anything at all, or replace
         them with their description or with one replacement string (default is '.')
         :param text: a string that might contain emojis
+        :param stats: if given, the CleanStats to count the replaced emojis in
         :return: 'text' where emojis have been processed according to the init parameters of the class
         """
         if self.preserve_emojis:
             return text
+        if not self.emoji_detector.may_contain_emoji(text):
+            # most texts contain no emojis at all
+            return text
         if self.describe_emojis:
-            return self.replace_emojis(text)
+            return self.replace_emojis(text, stats=stats)
         if self.emoji_replacement:
-            return self.replace_emojis(text, self.emoji_replacement)
+            return self.replace_emojis(text, self.emoji_replacement, stats)
         return text
 
-    def replace_emojis(self, text: str, replacement='') -> str:
+    def replace_emojis(self, text: str, replacement='', stats=None) -> str:
         """
-        Replace emojis in text. Emojis are defined in emoji_dictionary.py, if no replacement is given,
-        we replace each emoji by its value in the emoji_dictionary. Otherwise, replace each emoji
-        by replacement
+        Replace emojis in text. If no replacement is given, we replace each emoji defined in emoji_dictionary.py
+        by its value in the emoji_dictionary. Otherwise, replace each emoji found by the emoji sequence rules
+        by replacement, without loading the emoji_dictionary. The text is scanned once, where emojis overlap
+        the longest sequence is replaced.
 
         Note: we don't offer the possibility to delete emojis without a trace, i.e. without at least replacing
         them by a '.' . We might add that possibility later if it turns out to be useful.
 
         :param text: a string that might contain emojis
         :param replacement: if not empty, replace each emoji in text with this string
+        :param stats: if given, the CleanStats to count the replaced emojis in
         :return: a text without emojis, replaced either by emoji descriptions or by param replacement
         """
-        for emoji in emoji_dictionary.EMOJI_PATTERN:
-            if emoji in text and emoji not in self.preserve_strings:
-                if replacement:
-                    text = text.replace(emoji, replacement)
-                else:
-                    text = text.replace(emoji, emoji_dictionary.EMOJI_PATTERN[emoji])
-        return text
+        def replace(emoji):
+            if emoji in self.preserve_strings:
+                return emoji
+            if stats is not None:
+                stats.emojis_replaced += 1
+            if replacement:
+                return replacement
+            return emoji_store.descriptions()[emoji]
+
+        if replacement:
+            return self.emoji_detector.sub(text, replace)
+        return self.emoji_matcher.sub(text, replace)
 
     def validate_characters(self, token: str) -> str:
         """
         Checks each character of the input word (token) to see
         if it matches any predefined character, as defined
         in constants or the second input 'string_to_preserve'.
+        The rules for each character are compiled into self.translation_table,
+        so the token is cleaned in one pass.
         """
-        for char in token:
-            repl = self.replacement_dictionary[char] if char in self.replacement_dictionary else ''
-            if repl:
-                token = token.replace(char, repl)
-            elif char.isdigit():
-                continue
-            elif char in emoji_dictionary.EMOJI_PATTERN:
-                # We have already taken care of emojis
-                continue
-            elif char.lower() not in self.alphabet and char not in self.preserved_punctuation:
-                token = self.replace_or_drop(char, token)
+        if self.valid_token.fullmatch(token):
+            # nothing to clean
+            return token + ' '
+        if self.token_cache is not None:
+            return self.token_cache(token)
+        return self.translate_token(token)
 
-        return token + ' '
+    def translate_token(self, token: str) -> str:
+        return token.translate(self.translation_table) + ' '
 
-    def replace_or_drop(self, char: str, token: str) -> str:
-        replacement = self.get_ice_alpha_replacement(char)
-        if replacement:
-            token = token.replace(char, replacement)
-        elif char in ['(', ')', '"']:
-            # again: where do these symbols come from?
-            # token = token.replace(char, " , ")
-            pass
-        elif char not in self.preserved_punctuation and char not in self.replacement_dictionary.values():
-            token = token.replace(char, '')
+    def token_cache_info(self):
+        """
+        Return the statistics of the token cache (hits, misses, maxsize, currsize), None if there is no cache.
+        """
+        if self.token_cache is None:
+            return None
+        return self.token_cache.cache_info()
 
-        return token
+    def clear_token_cache(self) -> None:
+        if self.token_cache is not None:
+            self.token_cache.cache_clear()
 
-    def get_ice_alpha_replacement(self, char) -> str:
+    def translate_character(self, char: str) -> str:
         """
-        Replace 'char' with a letter or letters from self.alphabet. Return an empty string if the current
-        self.alphabet turns out not to contain the replacement value from the post_dict_lookup
-
-        :param char: a char to check for validity
-        :return: 'char' if valid, replacement, if valid replacement is found, empty string otherwise
+        Return the cleaned output for 'char', see CleanerTables.translate_character()
         """
-        if char in self.post_dict_lookup:
-            # validate the character returned by post_dict_lookup
-            for lookup_char in self.post_dict_lookup[char].lower():
-                if lookup_char not in self.alphabet:
-                    return ''
-            return self.post_dict_lookup[char]
-        return ''
+        return self.tables.translate_character(char)
+
+    def replace_or_drop(self, char: str, token: str) -> str:
+        return self.tables.replace_or_drop(char, token)
+
+    def get_ice_alpha_replacement(self, char) -> str:
+        return self.tables.get_ice_alpha_replacement(char)
 
     def clean_labelled_translation(self, token) -> str:
         if self.delete_translations:
@@ -264,11 +597,20 @@ class TextCleaner:
         Adds the custom_replacements to the collection of character
         replacement dictionaries, as defined in self.replacement_dictionary
         """
+        if self.add_replacements(custom_replacements):
+            self.compile_tables()
+
+    def add_replacements(self, custom_replacements: dict) -> bool:
+        """
+        Adds the custom_replacements to the overlay of self.replacement_dictionary, without compiling the tables.
+        Returns False if custom_replacements is not a dictionary.
+        """
         if type(custom_replacements) is dict:
             self.replacement_dictionary.update(custom_replacements)
-        else:
-            logging.warning("Param 'custom_replacement' should be a dictionary, but is a " +
-                            str(type(custom_replacements)) + ". Did not update replacement_dictionary")
+            return True
+        logging.warning("Param 'custom_replacement' should be a dictionary, but is a " +
+                        str(type(custom_replacements)) + ". Did not update replacement_dictionary")
+        return False
 
 
 
@@ -277,27 +619,124 @@ def parse_arguments():
     group = parser.add_mutually_exclusive_group()
     group.add_argument('--infile', '-i', nargs='?', type=argparse.FileType('r'), default=sys.stdin, help="Text file to be cleaned")
     group.add_argument('text', nargs='?', type=str, help='Input string to be cleaned')
+    parser.add_argument('--jobs', '-j', type=int, default=1, help="Number of processes cleaning the input file")
+    parser.add_argument('--profile', action='store_true',
+                        help="Profile the cleaning with cProfile and print the functions sorted by --profile-sort "
+                             "to stderr")
+    parser.add_argument('--profile-sort', default='cumulative', metavar='SORT',
+                        choices=['cumulative', 'tottime', 'ncalls', 'filename', 'name'],
+                        help="Sort order of the --profile output (default: cumulative)")
+    parser.add_argument('--trace-out', metavar='FILE',
+                        help="Write a trace of the stages of each chunk of lines to FILE, "
+                             "in the Chrome trace event format")
+    parser.add_argument('--mem-report', action='store_true',
+                        help="Print the peak memory allocated during each stage to stderr")
+    parser.add_argument('--slow-threshold', type=float, metavar='MS',
+                        help="Log each line taking longer than MS milliseconds to clean")
+    parser.add_argument('--slow-log', metavar='FILE',
+                        help="Append the lines slower than --slow-threshold to FILE as JSON lines, default is stderr")
     args = parser.parse_args()
     
     return args
 
 
+# the cleaner of a worker process, see init_worker()
+_worker_cleaner = None
+
+
+def init_worker(cleaner_args: dict) -> None:
+    """
+    Initializes a worker process of clean_in_parallel(), creating one TextCleaner for all chunks it cleans.
+    """
+    global _worker_cleaner
+    _worker_cleaner = TextCleaner(**cleaner_args)
+
+
+def clean_chunk(lines: list) -> list:
+    return _worker_cleaner.clean_many(lines)
+
+
+def clean_traced_chunk(index: int, lines: list) -> tuple:
+    from text_cleaner import clean_profile
+    return clean_profile.trace_chunk(_worker_cleaner, index, lines)
+
+
+def clean_in_parallel(lines: Iterable[str], jobs: int, cleaner_args={}, chunk_size=CHUNK_SIZE,
+                      trace=None) -> Iterable[str]:
+    """
+    Clean 'lines' with a pool of 'jobs' processes, each cleaning chunks of 'chunk_size' lines.
+    The cleaned lines are yielded in the order of 'lines'. Lines are only read from 'lines' as
+    results are consumed, at most two chunks per process are in progress at any time.
+
+    :param lines: the lines to clean
+    :param jobs: number of worker processes
+    :param cleaner_args: keyword arguments for the TextCleaner of each worker
+    :param chunk_size: number of lines sent to a worker at a time
+    :param trace: if a list, the trace events of each chunk are appended to it, see clean_profile.py
+    :return: an iterator over the cleaned lines
+    """
+    # only needed here, not imported at startup
+    import multiprocessing
+
+    lines = iter(lines)
+    chunks = iter(lambda: [line for _, line in zip(range(chunk_size), lines)], [])
+    with multiprocessing.Pool(jobs, initializer=init_worker, initargs=(cleaner_args,)) as pool:
+        pending = collections.deque()
+        for index, chunk in enumerate(chunks):
+            if trace is None:
+                pending.append(pool.apply_async(clean_chunk, (chunk,)))
+            else:
+                pending.append(pool.apply_async(clean_traced_chunk, (index, chunk)))
+            if len(pending) >= 2 * jobs:
+                yield from _chunk_results(pending.popleft().get(), trace)
+        while pending:
+            yield from _chunk_results(pending.popleft().get(), trace)
+
+
+def _chunk_results(result, trace) -> list:
+    """
+    Return the cleaned lines of the 'result' of a worker, appending its trace events to 'trace' if tracing.
+    """
+    if trace is None:
+        return result
+    lines, events = result
+    trace.extend(events)
+    return lines
+
+
+def read_lines(infile: TextIO) -> Iterable[str]:
+    """
+    Yield the lines of 'infile' as they are read, split the same way as str.splitlines() splits the whole content.
+    """
+    for line in infile:
+        yield from line.splitlines()
+
+
 def main():
     args = parse_arguments()
-    cleaner = TextCleaner()
+    cleaner_args = {}
+    if args.slow_threshold is not None:
+        cleaner_args = {'slow_threshold': args.slow_threshold / 1000, 'slow_log': args.slow_log}
+    cleaner = TextCleaner(**cleaner_args)
     if args.text:
-        text = args.text
-        print(cleaner.clean(text))
+        lines = [args.text]
     elif args.infile == sys.stdin and sys.stdin.isatty():
         print("Please provide an input file or a string to be cleaned")
         raise ValueError("No input given")
     else:
-        file_content = args.infile.read().splitlines()
-        cleaned_arr = []
-        for line in file_content:
-            cleaned_arr.append(cleaner.clean(line))
-        for elem in cleaned_arr:
-            print(elem)
+        # stream the input, each line is written as soon as it is cleaned
+        lines = read_lines(args.infile)
+    if args.profile or args.trace_out or args.mem_report:
+        # only imported when needed, cleaning without these options is not slowed down
+        from text_cleaner import clean_profile
+        clean_profile.run(cleaner, lines, args, cleaner_args)
+        return
+    if args.jobs > 1 and not args.text:
+        cleaned_lines = clean_in_parallel(lines, args.jobs, cleaner_args)
+    else:
+        cleaned_lines = map(cleaner.clean, lines)
+    for elem in cleaned_lines:
+        print(elem)
 
 
 if __name__ == '__main__':
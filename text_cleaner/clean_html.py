@@ -1,17 +1,29 @@
 import argparse
+import logging
 import re
 from typing import Union, TextIO
-from bs4 import BeautifulSoup as beautiful_soup, element
+from bs4 import BeautifulSoup as beautiful_soup, SoupStrainer, element
+from bs4.builder import builder_registry
 
-import text_cleaner
 from text_cleaner import constants as consts
+from text_cleaner import html_stream, html_tables
 
 PUNCTUATION = '[,.:;?!]'
+# the rest of a line up to and including its last full-stop/comma followed by a whitespace, see clean_up_urls()
+URL_END = re.compile(r'.*([.,])\s')
 # HTML
 TOP_TABLE_ELEM = 'table'
 TABLE_ROW = 'tr'
 TABLE_HEADER = 'th'
 TABLE_CELL = 'td'
+# BeautifulSoup parser backends, lxml and html5lib have to be installed separately. All of them give the same
+# text for well-formed html, they only differ in how they repair broken html
+PARSERS = ('html.parser', 'lxml', 'html5lib')
+DEFAULT_PARSER = 'html.parser'
+# 'auto' uses the first one installed. html5lib is slower than html.parser, it is only used if asked for
+AUTO_PARSERS = ('lxml', DEFAULT_PARSER)
+# 'soup' builds a BeautifulSoup tree of the document, 'stream' extracts the text while parsing, see html_stream.py
+ENGINES = ('soup', 'stream')
 
 
 class HtmlCleaner:
@@ -21,14 +33,24 @@ class HtmlCleaner:
     parse the accessible EPUB-format.
     """
 
-    def __init__(self, tag_replacements={}, content_parent_div={"class": "content-text"}, top_elem='div'):
+    def __init__(self, tag_replacements={}, content_parent_div={"class": "content-text"}, top_elem='div',
+                 parser=DEFAULT_PARSER, engine='soup'):
         """
         Sets the values for the parsing.
 
         :param tag_replacements: a dictionary of html-tags and their replacements. Default is in constants.py
         :param content_parent_div: the parent div of the content of the html-doc
         :param top_elem: top element to look for within the content_parent_div
+        :param parser: the BeautifulSoup parser, one of PARSERS or 'auto' for the fastest one installed.
+                        If the parser is not installed, 'html.parser' is used with a warning. Default is 'html.parser'
+        :param engine: 'soup' or 'stream'. The stream engine gives the same text as the soup engine with html.parser,
+                        without building a tree of the whole document, so it needs much less memory for large
+                        documents. It ignores 'parser'. Default is 'soup'
         """
+        if engine not in ENGINES:
+            raise ValueError("Unknown engine '" + engine + "', use one of " + ', '.join(ENGINES))
+        self.engine = engine
+        self.parser = resolve_parser(parser)
         # a map of tags and their replacement strings
         if tag_replacements:
             self.tag_replacements = tag_replacements
@@ -46,6 +68,8 @@ class HtmlCleaner:
         :param from_file: if True, 'html' is a filename
         :return: plain text extracted from the html, with html tag replacements as defined in self.tag_replacements
         """
+        if self.engine == 'stream':
+            return self.clean_html_stream(html, from_file)
         if from_file:
             html_soup = self.extract_html_from_file(html)
         else:
@@ -59,13 +83,41 @@ class HtmlCleaner:
 
         return text
 
+    def clean_html_stream(self, html: str, from_file=False) -> str:
+        """
+        clean_html() with the stream engine, see html_stream.py. Files are read in parts, which only gives
+        a different text than the soup engine after broken numeric character references, see extract_text()
+        """
+        if from_file:
+            with open(html) as f:
+                text = html_stream.extract_text(html_stream.read_html(f), self.tag_suffixes(), self.top_elem,
+                                                self.content_parent_div)
+        else:
+            text = html_stream.extract_text([html], self.tag_suffixes())
+        return tidy_up_text_format(text)
+
+    def tag_suffixes(self) -> dict:
+        """
+        Return the strings appended to the content of each tag in self.tag_replacements
+        """
+        return {tag: ' ' + replacement + ' ' for tag, replacement in self.tag_replacements.items()}
+
     def extract_html_from_file(self, html_doc) -> element.Tag:
-        html_doc_content = open(html_doc)
-        soup = self.extract_html_from_string(html_doc_content)
+        """
+        Return the first top_elem with the attributes content_parent_div in the file 'html_doc', None if there is none.
+        Only that content is kept in the parse tree, everything outside of it (head, navigation, scripts) is
+        skipped while parsing. html5lib does not support this and still builds the whole tree.
+        In broken html, where an end tag of an element around the content closes the content early, the content
+        now only ends at its own end tag, since the elements around it are not parsed.
+        """
+        with open(html_doc) as f:
+            html_doc_content = f.read()
+        content = SoupStrainer(self.top_elem, self.content_parent_div)
+        soup = beautiful_soup(html_doc_content, features=self.parser, parse_only=content)
         return soup.find(self.top_elem, self.content_parent_div)
 
     def extract_html_from_string(self, html_str: Union[str, TextIO]) -> element.Tag:
-        soup = beautiful_soup(html_str, features='html.parser')
+        soup = beautiful_soup(html_str, features=self.parser)
         return soup
 
     @staticmethod
@@ -74,25 +126,9 @@ class HtmlCleaner:
         Organizes text in tables to a more readable form for TTS engines.
         This function does so by prepending a table header to each data
         cell in the same column and removes all original text in headers.
+        Each table is flattened on its own rows, with colspan and rowspan, see html_tables.py.
         """
-        tables = soup.find_all(TOP_TABLE_ELEM)
-
-        for table in tables:
-            table_row = table.find_all(TABLE_ROW)
-            # used by each cell to reference it's header content
-            table_headers = table.find_all(TABLE_HEADER)
-
-            for row in table_row:
-                # list of cells for current row
-                table_cell = row.find_all(TABLE_CELL)
-                for idx2, cell in enumerate(table_cell):
-                    if idx2 < len(table_headers):
-                        cell = cell.insert_before(table_headers[idx2].get_text() + ': ')
-
-            # remove headers after they've been prepended to each cell in their column
-            for th in table_headers:
-                th.decompose()
-
+        html_tables.flatten_tables(soup.find_all(TOP_TABLE_ELEM))
         return soup
 
     def append_punctuation_to_tag_content(self, text_tag: element.Tag) -> element.Tag:
@@ -100,13 +136,30 @@ class HtmlCleaner:
         Appends a string to closing html tags as described
         by 'html_closing_tag_replacement' in constants.py
         """
-        for tag in self.tag_replacements:
-            for text_within_tag in text_tag.find_all(tag):
-                text_within_tag.append(' ' + self.tag_replacements[tag] + ' ')
+        suffixes = self.tag_suffixes()
+        # one walk over the tree instead of one find_all() per tag. Each suffix is appended to the end of its own
+        # tag, so the order in which the tags get their suffixes does not change the result
+        tags = [tag for tag in text_tag.descendants if isinstance(tag, element.Tag) and tag.name in suffixes]
+        for tag in tags:
+            tag.append(suffixes[tag.name])
 
         return text_tag
 
 
+def resolve_parser(parser: str) -> str:
+    """
+    Return the installed parser to use for 'parser', see HtmlCleaner.__init__()
+    """
+    if parser == 'auto':
+        return next(name for name in AUTO_PARSERS if builder_registry.lookup(name))
+    if parser not in PARSERS:
+        raise ValueError("Unknown parser '" + parser + "', use one of " + ', '.join(PARSERS) + " or 'auto'")
+    if builder_registry.lookup(parser) is None:
+        logging.warning("Parser '" + parser + "' is not installed, using '" + DEFAULT_PARSER + "' instead")
+        return DEFAULT_PARSER
+    return parser
+
+
 def tidy_up_text_format(text):
     """
     Removes duplicate punctuation marks, whitespaces or newlines.
@@ -137,20 +190,43 @@ def remove_consecutive_punct_marks(text) -> str:
     
     # the following regex demarks a string with 1 punctuation 
     # mark followed by 1 or more punctuation marks, with or without spaces in between
-    text = re.sub(r'(' + PUNCTUATION + ')' + '(\s*' + PUNCTUATION + ')+', r'\1', text)
+    text = re.sub(r'(' + PUNCTUATION + ')' + r'(?:\s*' + PUNCTUATION + ')+', r'\1', text)
     return text
 
 
 def clean_up_urls(text):
     # demarks a string starting with "http", "https" or "www." followed by any 
     # string up untill a full-stop/comma, followed by one or more whitespace/newline.
-    return re.sub(r'(' + text_cleaner.URL_PATTERN + ')(.*)([.,])+([\s\n])', r'\1\2 \3 ', text)
+    # Same as re.sub(r'(' + text_cleaner.URL_PATTERN + r')(.*)([.,])+([\s\n])', r'\1\2 \3 ', text), but the
+    # two '.*' of that regex take quadratic time on long lines. Its greedy match always ends at the last
+    # full-stop/comma followed by a whitespace in the line (a newline included), so there is at most one
+    # match per line and each line is searched once from its first url.
+    # Note that URL_PATTERN has groups of its own, so r'\2' and r'\3' are its 'www' and 'http' groups.
+    lines = text.split('\n')
+    for i in range(len(lines)):
+        line = lines[i] if i == len(lines) - 1 else lines[i] + '\n'
+        if i == 0 and line.startswith('www'):
+            start = 0
+            end = URL_END.match(line, 3)
+            replacement = 'wwwwww  '
+        else:
+            start = line.find('http')
+            end = URL_END.match(line, start + 4) if start >= 0 else None
+            replacement = line[start:end.start(1)] + ' http ' if end else ''
+        if end:
+            line = line[:start] + replacement + line[end.end():]
+        lines[i] = line
+    return ''.join(lines)
 
 
 def parse_arguments():
     parser = argparse.ArgumentParser()
     parser.add_argument("html_doc", help="html document")
     parser.add_argument("-w", "--write", default="", help="name of the file for the text output")
+    parser.add_argument("--parser", default=DEFAULT_PARSER, choices=PARSERS + ('auto',),
+                        help="BeautifulSoup parser, 'auto' uses lxml if it is installed")
+    parser.add_argument("--engine", default='soup', choices=ENGINES,
+                        help="'stream' extracts the text without building a tree, for very large documents")
     args = parser.parse_args()
 
     return args
@@ -160,7 +236,7 @@ def main():
         cmdline_args = parse_arguments()
         html_doc = cmdline_args.html_doc
         output_file = cmdline_args.write
-        cleaner = HtmlCleaner()
+        cleaner = HtmlCleaner(parser=cmdline_args.parser, engine=cmdline_args.engine)
         clean= cleaner.clean_html(
             html=html_doc,
             from_file=True)
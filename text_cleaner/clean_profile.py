@@ -0,0 +1,164 @@
+"""
+    Profiling, tracing and memory reports for the text_cleaner command line tool, see the --profile,
+    --trace-out and --mem-report options of clean.main(). Only imported if one of them is given.
+
+    The trace is written in the Chrome trace event format, it can be opened in chrome://tracing or
+    https://ui.perfetto.dev (which both run locally in the browser). Each chunk of CHUNK_SIZE lines is one
+    span, with one span per stage of TextCleaner.clean() below it. A stage span covers the time of that stage
+    summed over all lines of the chunk, so the stage spans are laid out one after the other and only their
+    lengths are meaningful, not their positions.
+"""
+import cProfile
+import itertools
+import json
+import os
+import pstats
+import sys
+import time
+import tracemalloc
+from typing import Iterable
+
+from text_cleaner.clean_stats import STAGES, CleanStats
+
+# lines of the sorted --profile output
+PROFILE_LINES = 30
+
+
+class MemoryStats(CleanStats):
+    """
+    CleanStats which also record the peak of the memory allocated during each stage, as traced by tracemalloc.
+    tracemalloc has to be started before the stages run.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.peaks = dict.fromkeys(STAGES, 0)
+
+    def timed(self, stage: str, function, *args, calls=1):
+        # reset_peak() is new in Python 3.9, before that the peak is the one since tracemalloc was started
+        if hasattr(tracemalloc, 'reset_peak'):
+            tracemalloc.reset_peak()
+        before = tracemalloc.get_traced_memory()[0]
+        result = super().timed(stage, function, *args, calls=calls)
+        self.peaks[stage] = max(self.peaks.get(stage, 0), tracemalloc.get_traced_memory()[1] - before)
+        return result
+
+    def add(self, other: CleanStats) -> None:
+        super().add(other)
+        for stage, peak in getattr(other, 'peaks', {}).items():
+            self.peaks[stage] = max(self.peaks.get(stage, 0), peak)
+
+
+def span(name: str, start: float, seconds: float, pid: int, tid=0, **args) -> dict:
+    """
+    Return a complete event of the Chrome trace event format, 'start' is a time.perf_counter() value.
+    """
+    return {'name': name, 'ph': 'X', 'ts': start * 1e6, 'dur': seconds * 1e6, 'pid': pid, 'tid': tid,
+            'args': args}
+
+
+def chunk_events(index: int, lines: int, start: float, end: float, stats: CleanStats, pid=None) -> list:
+    """
+    Return the span of chunk number 'index' from 'start' to 'end' and the spans of its stages, see the module
+    docstring.
+    """
+    pid = os.getpid() if pid is None else pid
+    events = [span('chunk {}'.format(index), start, end - start, pid, lines=lines,
+                   **{counter: value for counter, value in stats.as_dict().items() if counter not in ('times', 'calls')})]
+    stage_start = start
+    for stage in STAGES:
+        seconds = stats.times.get(stage, 0.0)
+        if seconds:
+            events.append(span(stage, stage_start, seconds, pid, calls=stats.calls.get(stage, 0)))
+            stage_start += seconds
+    return events
+
+
+def clean_lines(cleaner, lines: Iterable[str], stats: CleanStats, trace=None, chunk_size=1000) -> Iterable[str]:
+    """
+    Yield the cleaned 'lines', adding their statistics to 'stats'. If 'trace' is a list, the events of each
+    chunk of 'chunk_size' lines are appended to it.
+    """
+    lines = iter(lines)
+    chunks = iter(lambda: list(itertools.islice(lines, chunk_size)), [])
+    for index, chunk in enumerate(chunks):
+        chunk_stats = type(stats)()
+        start = time.perf_counter()
+        cleaned = [cleaner.clean_with_stats(line, chunk_stats).text for line in chunk]
+        end = time.perf_counter()
+        stats.add(chunk_stats)
+        if trace is not None:
+            trace.extend(chunk_events(index, len(chunk), start, end, chunk_stats))
+        yield from cleaned
+
+
+def trace_chunk(cleaner, index: int, lines: list) -> tuple:
+    """
+    Clean the chunk number 'index' in a worker process of clean_in_parallel(), return the cleaned lines and
+    the trace events of the chunk.
+    """
+    stats = CleanStats()
+    start = time.perf_counter()
+    cleaned = [cleaner.clean_with_stats(line, stats).text for line in lines]
+    return cleaned, chunk_events(index, len(lines), start, time.perf_counter(), stats)
+
+
+def write_trace(path: str, events: list) -> None:
+    events = [{'name': 'process_name', 'ph': 'M', 'pid': pid, 'args': {'name': 'text_cleaner {}'.format(pid)}}
+              for pid in sorted({event['pid'] for event in events})] + events
+    with open(path, 'w') as f:
+        json.dump({'traceEvents': events, 'displayTimeUnit': 'ms'}, f)
+
+
+def print_memory_report(stats: MemoryStats, file=sys.stderr) -> None:
+    print('{:24s} {:>12s} {:>12s}'.format('stage', 'peak KiB', 'seconds'), file=file)
+    for stage in STAGES:
+        print('{:24s} {:12.1f} {:12.3f}'.format(stage, stats.peaks.get(stage, 0) / 1024, stats.times.get(stage, 0.0)),
+              file=file)
+
+
+def run(cleaner, lines: Iterable[str], args, cleaner_args={}) -> None:
+    """
+    Clean 'lines' and print them like clean.main(), with the profile, trace and memory report requested by 'args'.
+    The reports are written to stderr, the cleaned lines to stdout.
+    'cleaner_args' are the keyword arguments of the TextCleaner of each worker of --jobs.
+    --profile alone profiles TextCleaner.clean(), --trace-out and --mem-report run TextCleaner.clean_with_stats()
+    to get the times and memory of each stage. Only --trace-out can be combined with --jobs, the other reports
+    need all cleaning done in this process.
+    """
+    from text_cleaner.clean import CHUNK_SIZE, clean_in_parallel
+
+    trace = [] if args.trace_out else None
+    stats = MemoryStats() if args.mem_report else CleanStats()
+    if args.jobs > 1 and (args.profile or args.mem_report):
+        print('--profile and --mem-report only measure this process, cleaning without --jobs', file=sys.stderr)
+    if args.jobs > 1 and not (args.profile or args.mem_report):
+        cleaned_lines = clean_in_parallel(lines, args.jobs, cleaner_args, trace=trace)
+    elif trace is not None or args.mem_report:
+        cleaned_lines = clean_lines(cleaner, lines, stats, trace, CHUNK_SIZE)
+    else:
+        cleaned_lines = map(cleaner.clean, lines)
+
+    profiler = cProfile.Profile() if args.profile else None
+    if args.mem_report:
+        tracemalloc.start()
+    start = time.perf_counter()
+    if profiler:
+        profiler.enable()
+    try:
+        for line in cleaned_lines:
+            print(line)
+    finally:
+        if profiler:
+            profiler.disable()
+        end = time.perf_counter()
+        if args.mem_report:
+            tracemalloc.stop()
+
+    if profiler:
+        pstats.Stats(profiler, stream=sys.stderr).sort_stats(args.profile_sort).print_stats(PROFILE_LINES)
+    if args.mem_report:
+        print_memory_report(stats)
+    if trace is not None:
+        trace.append(span('clean', start, end - start, os.getpid(), tid=1))
+        write_trace(args.trace_out, trace)
@@ -0,0 +1,269 @@
+"""
+    The compiled configuration of a TextCleaner.
+
+    The lookup tables of a cleaner only depend on its replacement dictionaries, alphabet and punctuation. These
+    are collected in an immutable, hashable CleanerConfig, and the tables derived from it are compiled once per
+    config into a CleanerTables object. Cleaners with equal configs share one CleanerTables object through an
+    interning registry, so creating another cleaner with the same options neither copies the replacement
+    dictionaries nor recompiles the tables. The registry holds weak references only, tables no longer used by
+    any cleaner are freed.
+
+    The compiled tables and the options of a cleaner can be saved to a snapshot file, see write_snapshot(). The
+    snapshot records the package version and a fingerprint of the package files the tables are compiled from,
+    and is only loaded if both still match.
+"""
+import collections
+import functools
+import hashlib
+import marshal
+import mmap
+import os
+import re
+import struct
+import weakref
+from typing import NamedTuple
+
+from text_cleaner import emoji_store
+from text_cleaner.emoji_matcher import KEYCAP, KEYCAP_BASES, EmojiDetector, EmojiMatcher
+
+DIGITS = '0123456789'
+SNAPSHOT_MAGIC = b'text_cleaner.snapshot'
+SNAPSHOT_FORMAT = 1
+# the package files the compiled tables depend on, see snapshot_fingerprint()
+FINGERPRINT_FILES = ('cleaner_config.py', 'constants.py', 'emoji_dictionary.bin', 'emoji_matcher.py', 'unicode_maps.py')
+
+# CleanerTables by CleanerConfig
+_registry = weakref.WeakValueDictionary()
+
+
+class CleanerConfig(NamedTuple):
+    """
+    The options of a TextCleaner the lookup tables are compiled from, see CleanerConfig.create().
+    """
+    replacements: frozenset
+    post_dict: frozenset
+    alphabet: frozenset
+    punctuation: frozenset
+
+    @classmethod
+    def create(cls, replacement_dict, post_dict, alphabet, punct_set) -> 'CleanerConfig':
+        """
+        :param replacement_dict: mapping of characters to their replacements
+        :param post_dict: mapping of foreign characters to their replacements by letters of 'alphabet'
+        :param alphabet: the valid letters
+        :param punct_set: the valid punctuation marks
+        """
+        if isinstance(replacement_dict, collections.ChainMap):
+            # iterating a ChainMap looks up each key in all maps, merging them is much faster
+            merged = {}
+            for mapping in reversed(replacement_dict.maps):
+                merged.update(mapping)
+            replacement_dict = merged
+        return cls(frozenset(replacement_dict.items()), frozenset(post_dict.items()), frozenset(alphabet),
+                   frozenset(punct_set))
+
+
+class TranslationTable(dict):
+    """
+    A table for str.translate(), mapping code points to their cleaned output. Entries are computed on first
+    lookup by 'rule' and then cached, so each distinct character is only validated once.
+    """
+
+    def __init__(self, rule):
+        super().__init__()
+        self.rule = rule
+
+    def __missing__(self, code_point: int) -> str:
+        output = self[code_point] = self.rule(chr(code_point))
+        return output
+
+    def compile(self, chars) -> None:
+        """
+        Compute the entries for all characters in 'chars' in advance.
+        """
+        for char in chars:
+            self[ord(char)]
+
+
+class CleanerTables:
+    """
+    The lookup tables compiled from a CleanerConfig:
+        * translation_table, the output for each character
+        * valid_token, matching tokens made only of characters that are not changed by the cleaning
+        * valid_text, the same for whole texts, allowing whitespace as well
+    Never modified after compiling, except for the entries translation_table computes on first lookup.
+    """
+
+    def __init__(self, config: CleanerConfig, snapshot=None):
+        """
+        Compile the tables for 'config', or restore them from 'snapshot', the return value of self.snapshot()
+        """
+        self.config = config
+        self.replacement_dictionary = dict(config.replacements)
+        self.replacement_values = frozenset(self.replacement_dictionary.values())
+        self.post_dict_lookup = dict(config.post_dict)
+        self.alphabet = config.alphabet
+        self.preserved_punctuation = config.punctuation
+        self.translation_table = TranslationTable(self.translate_character)
+        if snapshot is not None:
+            self.translation_table.update(snapshot['translation_table'])
+            self.valid_token = re.compile(snapshot['valid_token'])
+            self.valid_text = re.compile(snapshot['valid_text'])
+            return
+        self.translation_table.compile(''.join(self.replacement_dictionary) + ''.join(self.post_dict_lookup) +
+                                       ''.join(self.alphabet) + ''.join(self.preserved_punctuation))
+        candidates = set(self.alphabet) | set(''.join(self.alphabet).upper()) | set(self.preserved_punctuation)
+        valid_chars = {char for char in candidates | set(DIGITS) if self.translation_table[ord(char)] == char}
+        self.valid_token = re.compile(char_class(valid_chars) + '*')
+        # a text made of valid characters might still contain an emoji, then the emoji has to be processed
+        for char in list(valid_chars):
+            if emoji_detector().may_contain_emoji(char) or (char in KEYCAP_BASES and KEYCAP in valid_chars):
+                valid_chars.discard(char)
+        self.valid_text = re.compile(char_class(valid_chars, r'\s') + '*')
+
+    @classmethod
+    def for_config(cls, config: CleanerConfig, snapshot=None) -> 'CleanerTables':
+        """
+        Return the tables for 'config', compiled or restored from 'snapshot' only if no other cleaner uses them yet.
+        """
+        tables = _registry.get(config)
+        if tables is None:
+            tables = _registry[config] = cls(config, snapshot)
+        return tables
+
+    def snapshot(self) -> dict:
+        """
+        Return the compiled tables as a dictionary of marshallable values.
+        """
+        return {'config': tuple(self.config), 'translation_table': dict(self.translation_table),
+                'valid_token': self.valid_token.pattern, 'valid_text': self.valid_text.pattern}
+
+    @classmethod
+    def from_snapshot(cls, snapshot: dict) -> 'CleanerTables':
+        return cls.for_config(CleanerConfig(*snapshot['config']), snapshot)
+
+    def translate_character(self, char: str) -> str:
+        """
+        Return the cleaned output for 'char': its replacement, 'char' itself if valid, or an empty string
+        if 'char' should be dropped.
+        """
+        repl = self.replacement_dictionary.get(char, '')
+        if repl:
+            return repl
+        elif char.isdigit():
+            return char
+        elif emoji_detector().is_emoji(char):
+            # We have already taken care of emojis
+            return char
+        elif char.lower() not in self.alphabet and char not in self.preserved_punctuation:
+            return self.replace_or_drop(char, char)
+        return char
+
+    def replace_or_drop(self, char: str, token: str) -> str:
+        replacement = self.get_ice_alpha_replacement(char)
+        if replacement:
+            token = token.replace(char, replacement)
+        elif char in ['(', ')', '"']:
+            # again: where do these symbols come from?
+            # token = token.replace(char, " , ")
+            pass
+        elif char not in self.preserved_punctuation and char not in self.replacement_values:
+            token = token.replace(char, '')
+
+        return token
+
+    def get_ice_alpha_replacement(self, char) -> str:
+        """
+        Replace 'char' with a letter or letters from self.alphabet. Return an empty string if the current
+        self.alphabet turns out not to contain the replacement value from the post_dict_lookup
+
+        :param char: a char to check for validity
+        :return: 'char' if valid, replacement, if valid replacement is found, empty string otherwise
+        """
+        if char in self.post_dict_lookup:
+            # validate the character returned by post_dict_lookup
+            for lookup_char in self.post_dict_lookup[char].lower():
+                if lookup_char not in self.alphabet:
+                    return ''
+            return self.post_dict_lookup[char]
+        return ''
+
+
+def snapshot_fingerprint() -> str:
+    """
+    Return a hash of the package version and the contents of FINGERPRINT_FILES.
+    """
+    import text_cleaner
+    fingerprint = hashlib.sha1(text_cleaner.__version__.encode())
+    for name in FINGERPRINT_FILES:
+        with open(os.path.join(os.path.dirname(os.path.abspath(__file__)), name), 'rb') as f:
+            fingerprint.update(f.read())
+    return fingerprint.hexdigest()
+
+
+def write_snapshot(path: str, data: dict) -> None:
+    """
+    Write 'data', a dictionary of marshallable values, to the snapshot file 'path'. The file holds SNAPSHOT_MAGIC,
+    the size of the header, the header and 'data', so read_snapshot() can check the header before loading 'data'.
+    """
+    import text_cleaner
+    header = marshal.dumps((SNAPSHOT_FORMAT, text_cleaner.__version__, snapshot_fingerprint()))
+    with open(path, 'wb') as f:
+        f.write(SNAPSHOT_MAGIC + struct.pack('<I', len(header)) + header)
+        marshal.dump(data, f)
+
+
+def read_snapshot(path: str) -> dict:
+    """
+    Return the data of the snapshot file 'path', see write_snapshot(). The file is memory-mapped, so processes
+    loading the same snapshot share its pages.
+    Raises a ValueError if 'path' is not a snapshot, or was written by another version of the package or from
+    other package files.
+    """
+    import text_cleaner
+    with open(path, 'rb') as f:
+        try:
+            snapshot = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            raise ValueError(path + " is empty")
+    with snapshot:
+        start = len(SNAPSHOT_MAGIC) + 4
+        if snapshot[:len(SNAPSHOT_MAGIC)] != SNAPSHOT_MAGIC or len(snapshot) < start:
+            raise ValueError(path + " is not a text_cleaner snapshot")
+        header_size = struct.unpack_from('<I', snapshot, len(SNAPSHOT_MAGIC))[0]
+        try:
+            snapshot_format, version, fingerprint = marshal.loads(snapshot[start:start + header_size])
+            if snapshot_format != SNAPSHOT_FORMAT:
+                raise ValueError(path + " has the unknown snapshot format " + repr(snapshot_format))
+            if version != text_cleaner.__version__:
+                raise ValueError(path + " was written by text_cleaner " + str(version) + ", this is " +
+                                 text_cleaner.__version__)
+            if fingerprint != snapshot_fingerprint():
+                raise ValueError(path + " was written from other replacement maps or emoji data")
+            with memoryview(snapshot) as view, view[start + header_size:] as data:
+                return marshal.loads(data)
+        except (EOFError, TypeError) as e:
+            raise ValueError(path + " is corrupt (" + str(e) + ")")
+
+
+def char_class(chars, extra='') -> str:
+    """
+    Return a regex character class matching the characters in 'chars' and the class expression 'extra'.
+    """
+    return '[' + ''.join(re.escape(char) for char in sorted(chars)) + extra + ']'
+
+
+@functools.lru_cache(maxsize=None)
+def emoji_detector() -> EmojiDetector:
+    """
+    Return the EmojiDetector shared by all cleaners, built on first use.
+    """
+    return EmojiDetector(emoji_store.emoji_ranges())
+
+
+@functools.lru_cache(maxsize=None)
+def emoji_matcher() -> EmojiMatcher:
+    """
+    Return the EmojiMatcher shared by all cleaners, only needed to look up descriptions, built on first use.
+    """
+    return EmojiMatcher(emoji_store.emojis())
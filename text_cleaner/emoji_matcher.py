@@ -0,0 +1,194 @@
+"""
+    Single pass matching of emoji sequences.
+
+    Both matchers scan a text once from left to right instead of searching it once for every known emoji:
+        * EmojiMatcher stores all emojis of the emoji dictionary in a trie (nested dictionaries, one level
+          per code point). At each position the longest known sequence wins, so ZWJ sequences, flags and
+          skin tone variants are matched as a whole and not as their parts. Used to look up descriptions.
+        * EmojiDetector only needs the code point ranges of the single character emojis and applies the
+          sequence rules of Unicode emojis (keycaps, flags, tag sequences, skin tones, variation selectors
+          and ZWJ sequences). Used where an emoji only has to be found, not described.
+
+    Positions where an emoji might start are found with a regex over the code point ranges of the first
+    characters of all emojis, so text without any emoji is only checked once at C speed. Keycap emojis start
+    with an ASCII character like a digit, for them the regex looks for the character following it.
+"""
+import abc
+import re
+from typing import Callable, Iterable
+
+from text_cleaner.emoji_store import code_point_ranges
+
+# key of a trie node holding the complete emoji ending at that node, can never be a character of the text
+END = ''
+# see range_class()
+ASTRAL_GAP = 256
+
+# characters of emoji sequences, ranges are inclusive
+ZWJ = '\u200d'
+VARIATION_SELECTOR = '\ufe0f'
+KEYCAP = '\u20e3'
+KEYCAP_BASES = '#*0123456789'
+SKIN_TONES = ('\U0001f3fb', '\U0001f3ff')
+REGIONAL_INDICATORS = ('\U0001f1e6', '\U0001f1ff')
+TAG_BASE = '\U0001f3f4'
+TAGS = ('\U000e0020', '\U000e007e')
+CANCEL_TAG = '\U000e007f'
+
+
+class EmojiScanner(abc.ABC):
+    """
+    Finds the positions where an emoji might start, subclasses implement match().
+    """
+
+    def __init__(self, start_ranges: Iterable[tuple], prefixes: Iterable[str], triggers: Iterable[str]):
+        """
+        :param start_ranges: sorted, inclusive (first, last) code point ranges of the characters that can start an emoji
+        :param prefixes: ASCII characters only starting an emoji if followed by one of 'triggers', e.g. '1' of '1️⃣'
+        :param triggers: the characters following a prefix in an emoji
+        """
+        self.prefixes = set(prefixes)
+        self.triggers = set(triggers)
+        ranges = sorted(tuple(start_ranges) + code_point_ranges(self.triggers))
+        self.candidates = re.compile(range_class(ranges) if ranges else '(?!)')
+
+    @abc.abstractmethod
+    def match(self, text: str, pos: int) -> str:
+        """
+        Return the emoji starting at position 'pos' in 'text', or an empty string if there is none.
+        """
+
+    def may_contain_emoji(self, text: str) -> bool:
+        return self.candidates.search(text) is not None
+
+    def find_candidate(self, text: str, pos: int) -> int:
+        """
+        Return the first position from 'pos' on where an emoji might start, -1 if there is none.
+        """
+        candidate = self.candidates.search(text, pos)
+        if candidate is None:
+            return -1
+        start = candidate.start()
+        if start > pos and text[start] in self.triggers and text[start - 1] in self.prefixes:
+            return start - 1
+        return start
+
+    def is_emoji(self, text: str) -> bool:
+        return bool(text) and self.match(text, 0) == text
+
+    def sub(self, text: str, replace: Callable[[str], str]) -> str:
+        """
+        Replace each emoji in 'text' by the return value of 'replace', called with the matched emoji.
+        """
+        result = []
+        start = 0
+        pos = 0
+        while True:
+            pos = self.find_candidate(text, pos)
+            if pos < 0:
+                break
+            emoji = self.match(text, pos)
+            if not emoji:
+                pos += 1
+                continue
+            result.append(text[start:pos])
+            result.append(replace(emoji))
+            pos += len(emoji)
+            start = pos
+        if not result:
+            return text
+        result.append(text[start:])
+        return ''.join(result)
+
+
+class EmojiMatcher(EmojiScanner):
+
+    def __init__(self, emojis: Iterable[str]):
+        """
+        Builds the trie for 'emojis'.
+
+        :param emojis: the emoji sequences to match, e.g. the keys of emoji_dictionary.EMOJI_PATTERN
+        """
+        self.root = {}
+        for emoji in emojis:
+            node = self.root
+            for char in emoji:
+                node = node.setdefault(char, {})
+            node[END] = emoji
+        starts = set()
+        prefixes = set()
+        triggers = set()
+        for char, node in self.root.items():
+            if END in node or not char.isascii():
+                starts.add(char)
+            else:
+                prefixes.add(char)
+                triggers.update(node)
+        super().__init__(code_point_ranges(starts), prefixes, triggers)
+
+    def match(self, text: str, pos: int) -> str:
+        """
+        Return the longest emoji starting at position 'pos' in 'text', or an empty string if there is none.
+        """
+        node = self.root.get(text[pos])
+        emoji = ''
+        while node is not None:
+            emoji = node.get(END, emoji)
+            pos += 1
+            if pos == len(text):
+                break
+            node = node.get(text[pos])
+        return emoji
+
+
+class EmojiDetector(EmojiScanner):
+
+    def __init__(self, ranges: Iterable[tuple]):
+        """
+        Compiles the sequence rules of emojis into one regex, self.pattern. An emoji is an emoji element,
+        followed by any number of ZWJ and emoji element pairs. An emoji element is one of:
+            * a keycap: one of KEYCAP_BASES, an optional variation selector and KEYCAP
+            * a flag: two regional indicators
+            * a tag sequence: TAG_BASE, tags and CANCEL_TAG, e.g. the flag of Scotland
+            * a single character emoji, followed by an optional skin tone and an optional variation selector
+
+        :param ranges: sorted, inclusive (first, last) code point ranges of all single character emojis,
+                        see emoji_store.emoji_ranges()
+        """
+        ranges = tuple(ranges)
+        single = range_class(ranges, merge_astral=False)
+        skin_tone = '[' + SKIN_TONES[0] + '-' + SKIN_TONES[1] + ']'
+        regional_indicator = '[' + REGIONAL_INDICATORS[0] + '-' + REGIONAL_INDICATORS[1] + ']'
+        element = ('(?:[' + re.escape(KEYCAP_BASES) + ']' + VARIATION_SELECTOR + '?' + KEYCAP +
+                   '|' + regional_indicator + '{2}' +
+                   '|' + TAG_BASE + '[' + TAGS[0] + '-' + TAGS[1] + ']+' + CANCEL_TAG +
+                   # a skin tone is not modified by another one
+                   '|' + single + '(?:(?<!' + skin_tone + ')' + skin_tone + ')?' + VARIATION_SELECTOR + '?)')
+        self.pattern = re.compile(element + '(?:' + ZWJ + element + ')*')
+        start_ranges = ranges + ((ord(REGIONAL_INDICATORS[0]), ord(REGIONAL_INDICATORS[1])),)
+        super().__init__(start_ranges, KEYCAP_BASES, VARIATION_SELECTOR + KEYCAP)
+
+    def match(self, text: str, pos: int) -> str:
+        """
+        Return the emoji starting at position 'pos' in 'text', or an empty string if there is none.
+        """
+        emoji = self.pattern.match(text, pos)
+        return emoji.group() if emoji else ''
+
+
+def range_class(ranges: Iterable[tuple], merge_astral=True) -> str:
+    """
+    Return a regex character class for the sorted, inclusive (first, last) code point ranges 'ranges',
+    adjacent and overlapping ranges are merged. The regex engine checks ranges outside the Basic Multilingual
+    Plane one by one, if 'merge_astral' is True gaps of up to ASTRAL_GAP code points between them are merged
+    as well to keep the class short. The class then matches some characters in these gaps too.
+    """
+    merged = []
+    for first, last in ranges:
+        gap = ASTRAL_GAP if merge_astral and first > 0xFFFF else 1
+        if merged and merged[-1][1] >= first - gap:
+            merged[-1][1] = max(merged[-1][1], last)
+        else:
+            merged.append([first, last])
+    return '[' + ''.join(re.escape(chr(first)) + ('-' + re.escape(chr(last)) if last > first else '')
+                         for first, last in merged) + ']'
@@ -0,0 +1,126 @@
+"""
+    Compact storage of the emoji data from emoji_dictionary.py.
+
+    emoji_dictionary.py is the editable source of the emojis and their descriptions, but loading it means
+    executing a dictionary literal of several thousand entries. The same data is stored in a prebuilt marshal
+    file, emoji_dictionary.bin, holding a header followed by three records:
+        * the code point ranges of all single character emojis, enough to detect emojis (see EmojiDetector)
+        * all emojis as one string
+        * all descriptions as one string
+    The records are loaded separately and only when first needed, most cleaners only need the ranges.
+
+    After changing emoji_dictionary.py, rebuild the data file with:
+
+        python -c "from text_cleaner import emoji_store; emoji_store.write_data_file()"
+"""
+import functools
+import logging
+import marshal
+import os
+
+DATA_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'emoji_dictionary.bin')
+MAGIC = 'text_cleaner.emoji_store'
+FORMAT_VERSION = 2
+SEPARATOR = '\n'
+
+
+def _read_records(count: int) -> tuple:
+    """
+    Read the header and the first 'count' records following it from DATA_FILE. Returns the number of emojis
+    and the records, or (0, []) if the file is missing or was not written by this version of write_data_file().
+    """
+    try:
+        with open(DATA_FILE, 'rb') as f:
+            header = marshal.load(f)
+            if header[:2] != (MAGIC, FORMAT_VERSION):
+                raise ValueError('unknown format ' + repr(header[:2]))
+            return header[2], [marshal.load(f) for _ in range(count)]
+    except (OSError, EOFError, ValueError, TypeError) as e:
+        logging.warning("Could not read " + DATA_FILE + " (" + str(e) + "), loading emoji_dictionary.py instead")
+        return 0, []
+
+
+def _split(record: str, size: int) -> list:
+    """
+    Split a string record into its 'size' entries, returns an empty list if it does not have 'size' entries.
+    """
+    entries = record.split(SEPARATOR)
+    if len(entries) != size:
+        logging.warning(DATA_FILE + " is corrupt, loading emoji_dictionary.py instead")
+        return []
+    return entries
+
+
+@functools.lru_cache(maxsize=None)
+def emoji_ranges() -> tuple:
+    """
+    Return the code points of all single character emojis as sorted, inclusive (first, last) ranges.
+    """
+    _, records = _read_records(1)
+    if records:
+        flat = records[0]
+        return tuple(zip(flat[0::2], flat[1::2]))
+    from text_cleaner import emoji_dictionary
+    return code_point_ranges(emoji for emoji in emoji_dictionary.EMOJI_PATTERN if len(emoji) == 1)
+
+
+@functools.lru_cache(maxsize=None)
+def emojis() -> tuple:
+    """
+    Return all emojis of emoji_dictionary.EMOJI_PATTERN, in the same order.
+    """
+    size, records = _read_records(2)
+    entries = _split(records[1], size) if records else []
+    if entries:
+        return tuple(entries)
+    from text_cleaner import emoji_dictionary
+    return tuple(emoji_dictionary.EMOJI_PATTERN)
+
+
+@functools.lru_cache(maxsize=None)
+def descriptions() -> dict:
+    """
+    Return emoji_dictionary.EMOJI_PATTERN, the description of each emoji.
+    """
+    size, records = _read_records(3)
+    keys = _split(records[1], size) if records else []
+    values = _split(records[2], size) if keys else []
+    if values:
+        return dict(zip(keys, values))
+    from text_cleaner import emoji_dictionary
+    return emoji_dictionary.EMOJI_PATTERN
+
+
+def code_point_ranges(chars) -> tuple:
+    """
+    Return the code points of 'chars' as sorted, inclusive (first, last) ranges.
+    """
+    ranges = []
+    for code_point in sorted(set(ord(char) for char in chars)):
+        if ranges and ranges[-1][1] == code_point - 1:
+            ranges[-1][1] = code_point
+        else:
+            ranges.append([code_point, code_point])
+    return tuple((first, last) for first, last in ranges)
+
+
+def write_data_file(path=DATA_FILE) -> None:
+    """
+    Write the emojis and descriptions of emoji_dictionary.py to 'path'
+    """
+    from text_cleaner import emoji_dictionary
+    patterns = emoji_dictionary.EMOJI_PATTERN
+    for emoji, description in patterns.items():
+        if SEPARATOR in emoji or SEPARATOR in description:
+            raise ValueError("Emoji data may not contain " + repr(SEPARATOR) + ": " + repr(emoji))
+    ranges = code_point_ranges(emoji for emoji in patterns if len(emoji) == 1)
+    with open(path, 'wb') as f:
+        marshal.dump((MAGIC, FORMAT_VERSION, len(patterns)), f)
+        marshal.dump(tuple(code_point for first_last in ranges for code_point in first_last), f)
+        # stored as one string each, a list of strings is much slower to load
+        marshal.dump(SEPARATOR.join(patterns), f)
+        marshal.dump(SEPARATOR.join(patterns.values()), f)
+
+
+if __name__ == '__main__':
+    write_data_file()
@@ -0,0 +1,385 @@
+"""
+    Streaming html-to-text extraction, the 'stream' engine of clean_html.HtmlCleaner.
+
+    BeautifulSoup builds an object for each tag and string of a document before any text is extracted,
+    for large html exports that takes gigabytes of memory. TextExtractor gets the events of the standard
+    library's HTMLParser and writes the text as it goes: each string when its tag starts or ends, and
+    the tag replacement suffix of each tag when it is closed. Only tables are kept as (small) trees until
+    they are closed, since a header cell can change the text of every cell before it in its table.
+    Files are read in parts of READ_SIZE characters, see read_html(), so besides the extracted text the memory
+    needed is bounded by the largest table.
+
+    The text is the same as BeautifulSoup(html, 'html.parser').get_text() after HtmlCleaner.clean_html_tables()
+    and HtmlCleaner.append_punctuation_to_tag_content(), so the rules BeautifulSoup uses to build its tree
+    from the HTMLParser events are followed here:
+        * an end tag closes all tags opened after the last open tag of its name, and is ignored if there is none
+        * void elements like <br> are closed right away, a following </br> is ignored
+        * strings of only ASCII whitespace become a single space or newline, except inside <pre> and <textarea>
+        * strings inside <script>, <style>, <template>, <rt> and <rp>, comments, doctypes and processing
+          instructions are not part of the text, CDATA sections are
+"""
+import collections
+import re
+from html.parser import HTMLParser
+from typing import Iterable, Optional, TextIO
+
+from bs4.builder import HTMLTreeBuilder
+from bs4.dammit import EntitySubstitution
+
+from text_cleaner.html_tables import TABLE, TABLE_CELL, TABLE_HEADER, flatten_tables
+
+# the tree building rules of BeautifulSoup's html builders, see the module docstring
+VOID_ELEMENTS = frozenset(HTMLTreeBuilder.DEFAULT_EMPTY_ELEMENT_TAGS)
+STRING_CONTAINERS = frozenset(getattr(HTMLTreeBuilder, 'DEFAULT_STRING_CONTAINERS', {}))
+PRESERVE_WHITESPACE = frozenset(HTMLTreeBuilder.DEFAULT_PRESERVE_WHITESPACE_TAGS)
+ASCII_SPACES = '\x20\x0a\x09\x0c\x0d'
+# characters read from an html file at a time
+READ_SIZE = 2**16
+# reads without a '>' after which a part of the html is fed anyway, see read_html()
+MAX_PENDING_READS = 4
+# a character that can not be part of a character reference or the start of a tag, see part_end()
+PART_END = re.compile(r'[^-.a-zA-Z0-9&#<]')
+
+
+class Element:
+    """
+    A tag of a table while it is being parsed, see TextExtractor. 'contents' are Elements and strings,
+    'attrs' are only kept for table cells, for their colspan and rowspan.
+    """
+    __slots__ = ('name', 'parent', 'contents', 'attrs')
+
+    def __init__(self, name: str, parent=None, attrs=None):
+        self.name = name
+        self.parent = parent
+        self.contents = []
+        self.attrs = attrs or {}
+
+    def get(self, attribute: str, default=None):
+        return self.attrs.get(attribute, default)
+
+    def insert(self, position: int, string: str) -> None:
+        self.contents.insert(position, string)
+
+    def find_all(self, name: str) -> list:
+        """
+        Return the descendants named 'name' in document order, like Tag.find_all()
+        """
+        found = []
+        stack = list(reversed(self.contents))
+        while stack:
+            child = stack.pop()
+            if isinstance(child, Element):
+                if child.name == name:
+                    found.append(child)
+                stack.extend(reversed(child.contents))
+        return found
+
+    def get_text(self) -> str:
+        return ''.join(self.strings())
+
+    def strings(self, suffixes={}) -> Iterable[str]:
+        """
+        Yield the strings of this element in document order, each element followed by its suffix in 'suffixes'
+        """
+        stack = [iter(self.contents)]
+        names = [self.name]
+        while stack:
+            for child in stack[-1]:
+                if isinstance(child, Element):
+                    stack.append(iter(child.contents))
+                    names.append(child.name)
+                    break
+                yield child
+            else:
+                stack.pop()
+                name = names.pop()
+                if name in suffixes:
+                    yield suffixes[name]
+
+    def decompose(self) -> None:
+        """
+        Remove this element from the tree and clear its subtree, like Tag.decompose()
+        """
+        if self.parent is not None:
+            self.parent.contents.remove(self)
+            self.parent = None
+        stack = [self]
+        while stack:
+            element = stack.pop()
+            stack.extend(child for child in element.contents if isinstance(child, Element))
+            element.parent = None
+            element.contents = []
+
+
+class TextExtractor(HTMLParser):
+    """
+    Extracts the text of html fed to it, see the module docstring. Call close() after the last feed(),
+    then 'text' has the extracted text.
+    """
+
+    def __init__(self, suffixes: dict, content_name: Optional[str] = None, content_attrs=None):
+        """
+        :param suffixes: tag names and the string appended to the text of each tag of that name
+        :param content_name: if set, only the text of the first tag of this name with the attributes
+                             'content_attrs' is extracted, like HtmlCleaner.extract_html_from_file()
+        :param content_attrs: a dictionary of attribute values or a class name the content tag has to match
+        """
+        super().__init__(convert_charrefs=False)
+        self.suffixes = suffixes
+        self.content_name = content_name
+        self.content_attrs = content_attrs
+        # None before the content tag, True inside it, False after it. Always inside if there is no content tag
+        self.in_content = None if content_name else True
+        # names of the open tags, the number of open tags of each name and of the open tags of special kinds
+        self.open_tags = []
+        self.open_counts = collections.Counter()
+        self.string_containers = 0
+        self.preserve_whitespace = 0
+        # void elements closed at their start tag, their end tag is ignored once
+        self.closed_void = collections.Counter()
+        # the strings since the last tag
+        self.data = []
+        # the table being parsed and its current element
+        self.table = None
+        self.element = None
+        self.output = []
+
+    @property
+    def text(self) -> str:
+        return ''.join(self.output)
+
+    def is_content(self, name: str, attrs: list) -> bool:
+        if name != self.content_name:
+            return False
+        wanted = self.content_attrs or {}
+        if isinstance(wanted, str):
+            wanted = {'class': wanted}
+        values = {key: '' if value is None else value for key, value in attrs}
+        for key, value in wanted.items():
+            if value is True:
+                if key not in values:
+                    return False
+            elif key == 'class':
+                if key not in values or (value not in values[key].split() and value != values[key]):
+                    return False
+            elif values.get(key) != value:
+                return False
+        return True
+
+    def end_data(self, text=True) -> None:
+        """
+        Write the strings since the last tag to the output, or to the current table. 'text' is False
+        for comments and other strings which are not part of the text.
+        """
+        if not self.data:
+            return
+        data = ''.join(self.data)
+        self.data = []
+        if not self.preserve_whitespace and not data.strip(ASCII_SPACES):
+            data = '\n' if '\n' in data else ' '
+        if not text or self.string_containers or not self.in_content or not self.open_tags and self.content_name:
+            return
+        if self.table is not None:
+            self.element.contents.append(data)
+        else:
+            self.output.append(data)
+
+    def push(self, name: str, attrs: list) -> None:
+        self.open_tags.append(name)
+        self.open_counts[name] += 1
+        if name in STRING_CONTAINERS:
+            self.string_containers += 1
+        if name in PRESERVE_WHITESPACE:
+            self.preserve_whitespace += 1
+        if self.table is not None:
+            cell_attrs = dict(attrs) if name in (TABLE_HEADER, TABLE_CELL) else None
+            self.element = Element(name, self.element, cell_attrs)
+            self.element.parent.contents.append(self.element)
+        elif name == TABLE:
+            self.table = self.element = Element(name)
+
+    def pop(self) -> None:
+        name = self.open_tags.pop()
+        self.open_counts[name] -= 1
+        if name in STRING_CONTAINERS:
+            self.string_containers -= 1
+        if name in PRESERVE_WHITESPACE:
+            self.preserve_whitespace -= 1
+        if self.element is self.table and self.table is not None:
+            flatten_tables([self.table] + self.table.find_all(TABLE))
+            self.output.extend(self.table.strings(self.suffixes))
+            self.table = self.element = None
+        elif self.table is not None:
+            self.element = self.element.parent
+        elif name in self.suffixes:
+            self.output.append(self.suffixes[name])
+        if self.content_name and not self.open_tags:
+            # the end of the content, the rest of the document is skipped
+            self.in_content = False
+
+    def pop_to_tag(self, name: str) -> None:
+        if not self.open_counts[name]:
+            return
+        while self.open_tags[-1] != name:
+            self.pop()
+        self.pop()
+
+    def handle_starttag(self, tag: str, attrs: list, void=True) -> None:
+        self.end_data()
+        if self.in_content is False:
+            return
+        if self.in_content is None:
+            if not self.is_content(tag, attrs):
+                return
+            self.in_content = True
+        self.push(tag, attrs)
+        if void and tag in VOID_ELEMENTS:
+            self.handle_endtag(tag, check_closed=False)
+            self.closed_void[tag] += 1
+
+    def handle_startendtag(self, tag: str, attrs: list) -> None:
+        self.handle_starttag(tag, attrs, void=False)
+        self.handle_endtag(tag, check_closed=False)
+
+    def handle_endtag(self, tag: str, check_closed=True) -> None:
+        if check_closed and self.closed_void[tag]:
+            self.closed_void[tag] -= 1
+            return
+        self.end_data()
+        if self.in_content:
+            self.pop_to_tag(tag)
+
+    def handle_data(self, data: str) -> None:
+        self.data.append(data)
+
+    def handle_charref(self, name: str) -> None:
+        # as BeautifulSoup: the digits of a broken reference like '&#12ab;' are the reference, the rest is text
+        base = 16 if name[:1] in 'xX' else 10
+        digits = name[1:] if base == 16 else name
+        number = None
+        rest = ''
+        try:
+            number = int(digits, base)
+        except ValueError:
+            valid = '0123456789abcdef'[:base]
+            length = len(digits) - len(digits.lstrip(valid))
+            if length:
+                number = int(digits[:length], base)
+                rest = digits[length:]
+            else:
+                rest = digits
+        if number is not None:
+            self.handle_data(numeric_character(number))
+        self.handle_data(rest)
+
+    def handle_entityref(self, name: str) -> None:
+        character = EntitySubstitution.HTML_ENTITY_TO_CHARACTER.get(name)
+        self.handle_data(character if character is not None else '&' + name)
+
+    def handle_comment(self, data: str) -> None:
+        self.skip_string(data)
+
+    def handle_decl(self, decl: str) -> None:
+        self.skip_string(decl)
+
+    def handle_pi(self, data: str) -> None:
+        self.skip_string(data)
+
+    def unknown_decl(self, data: str) -> None:
+        if data.upper().startswith('CDATA['):
+            self.end_data()
+            self.data.append(data[len('CDATA['):])
+            # CDATA is text, also inside string containers
+            containers = self.string_containers
+            self.string_containers = 0
+            self.end_data()
+            self.string_containers = containers
+        else:
+            self.skip_string(data)
+
+    def skip_string(self, data: str) -> None:
+        self.end_data()
+        self.data.append(data)
+        self.end_data(text=False)
+
+    def close(self) -> None:
+        super().close()
+        self.end_data()
+        while self.open_tags and self.in_content:
+            self.pop()
+
+
+def numeric_character(number: int) -> str:
+    """
+    Return the character of the numeric character reference 'number', as the html standard and BeautifulSoup
+    resolve it.
+    """
+    if number == 0 or number > 0x10FFFF or 0xD800 <= number <= 0xDFFF:
+        return '\ufffd'
+    if 0x80 <= number <= 0x9F:
+        try:
+            return bytes([number]).decode('cp1252')
+        except UnicodeDecodeError:
+            return chr(number)
+    return chr(number)
+
+
+def read_html(file: TextIO, size=READ_SIZE) -> Iterable[str]:
+    """
+    Yield the html in 'file' in parts of about 'size' characters to feed to extract_text(). Each part ends
+    with a '>', so that HTMLParser sees each character reference with the character that ends it. Without a '>'
+    in MAX_PENDING_READS reads, the part ends after another character ending references, see part_end().
+    """
+    pending = []
+    pending_size = 0
+    for block in iter(lambda: file.read(size), ''):
+        pending.append(block)
+        pending_size += len(block)
+        # only the new block is searched, the pending ones have no '>'
+        end = block.rfind('>') + 1
+        if end:
+            end += pending_size - len(block)
+        elif pending_size > MAX_PENDING_READS * size:
+            # the pending text is only searched once, it is fed up to the end found
+            pending = [''.join(pending)]
+            end = part_end(pending[0], size)
+        if end:
+            html = ''.join(pending)
+            yield html[:end]
+            pending = [html[end:]]
+            pending_size -= end
+    if pending_size:
+        yield ''.join(pending)
+
+
+def part_end(html: str, size: int) -> int:
+    """
+    Return where to end a part of 'html' without a '>': after the last character in its last 'size' characters
+    that can neither continue a character reference nor start a tag, so that it ends every reference before it.
+    If there is none, 'html' is fed as a whole, as no character reference is that long.
+    """
+    # searched backwards in a reversed copy of the end
+    end = PART_END.search(html[:-size - 1:-1])
+    return len(html) - end.start() if end else len(html)
+
+
+def extract_text(chunks: Iterable[str], suffixes: dict, content_name=None, content_attrs=None) -> str:
+    """
+    Return the text of the html in 'chunks', with the suffixes of its tags, see TextExtractor.
+    Raises a ValueError if 'content_name' is set and there is no such tag with 'content_attrs'.
+    Parts ending after a character that ends character references, like those of read_html(), give the same
+    text as the whole html, unless it has broken numeric character references like '&#12ab;': HTMLParser does
+    not parse the rest of a part after them until the next part is fed, so the text after them depends on where
+    the part ends. Other parts can split character references.
+    """
+    extractor = TextExtractor(suffixes, content_name, content_attrs)
+    for chunk in chunks:
+        extractor.feed(chunk)
+        if extractor.in_content is False:
+            # the rest of the document is skipped anyway
+            break
+    extractor.close()
+    if extractor.in_content is None:
+        raise ValueError("No <" + content_name + "> with " + str(content_attrs) + " found")
+    return extractor.text
+
@@ -0,0 +1,111 @@
+"""
+    Flattening of html tables for TTS, shared by the 'soup' and the 'stream' engine of clean_html.HtmlCleaner.
+
+    Each data cell gets the text of the header of its column prepended, then the header cells are removed.
+    The functions work on BeautifulSoup tags and on html_stream.Element alike, they only use 'name',
+    'contents', get(), get_text(), insert() and decompose().
+
+    The rows of a table are its own <tr> children and those of its <thead>, <tbody> and <tfoot>, never the rows
+    of a table nested in one of its cells, each table is flattened on its own. Cells are placed in columns
+    like browsers do: a cell with colspan="n" covers n columns, one with rowspan="n" also covers its columns
+    in the next n - 1 rows, which moves the following cells of those rows to the right.
+    A header row is a row in the <thead> or a row of <th> cells and empty <td> cells, the header of a column is
+    the text of the <th> cells of header rows covering it, joined by a space if there are several header rows.
+    <th> cells in other rows (row headers) are removed as well, but do not prefix the cells of their column.
+"""
+from typing import Iterable
+
+TABLE = 'table'
+TABLE_HEAD = 'thead'
+TABLE_SECTIONS = (TABLE_HEAD, 'tbody', 'tfoot')
+TABLE_ROW = 'tr'
+TABLE_HEADER = 'th'
+TABLE_CELL = 'td'
+# the largest spans browsers accept, larger values count as these
+MAX_COLSPAN = 1000
+MAX_ROWSPAN = 65534
+
+
+def flatten_tables(tables: list) -> None:
+    """
+    Flatten 'tables', a list of all tables of a document or of a table and the tables nested in it, in document
+    order. Nested tables are flattened first, so a header cell with a table in it has the flattened text.
+    """
+    for table in reversed(tables):
+        flatten_table(table)
+
+
+def flatten_table(table) -> None:
+    """
+    Prepend the header text of its column to each data cell of 'table' and remove its header cells,
+    see the module docstring. Takes linear time in the number of cells, plus the columns each header cell covers
+    and the cells spanning into its row each cell is placed after.
+    """
+    column_headers = {}
+    data_cells = []
+    header_cells = []
+    # the cells spanning more than one row by their first column: the column after them and their last row
+    row_spans = {}
+    for row_index, (row, in_head) in enumerate(table_rows(table)):
+        cells = [child for child in row.contents if getattr(child, 'name', None) in (TABLE_HEADER, TABLE_CELL)]
+        is_header_row = in_head or is_header_cells(cells)
+        column = 0
+        for cell in cells:
+            while column in row_spans and row_spans[column][1] >= row_index:
+                column = row_spans[column][0]
+            colspan = span(cell, 'colspan', MAX_COLSPAN)
+            rowspan = span(cell, 'rowspan', MAX_ROWSPAN)
+            if rowspan > 1:
+                row_spans[column] = (column + colspan, row_index + rowspan - 1)
+            if cell.name == TABLE_HEADER:
+                header_cells.append(cell)
+                if is_header_row:
+                    text = cell.get_text()
+                    for header_column in range(column, column + colspan):
+                        column_headers.setdefault(header_column, []).append(text)
+            elif not is_header_row:
+                data_cells.append((cell, column))
+            column += colspan
+
+    # headers are resolved once, cells are only prefixed after all rows are read as header rows can come last
+    headers = {column: ' '.join(texts) + ': ' for column, texts in column_headers.items()}
+    for cell, column in data_cells:
+        if column in headers:
+            cell.insert(0, headers[column])
+    for cell in header_cells:
+        cell.decompose()
+
+
+def is_header_cells(cells: list) -> bool:
+    """
+    Return True if 'cells' are <th> cells, apart from empty <td> cells like the top left corner of a table
+    with row and column headers
+    """
+    return any(cell.name == TABLE_HEADER for cell in cells) and \
+        all(cell.name == TABLE_HEADER or not cell.get_text().strip() for cell in cells)
+
+
+def table_rows(table) -> Iterable:
+    """
+    Yield the rows of 'table' itself, see the module docstring, and whether they are in its <thead>
+    """
+    for child in table.contents:
+        name = getattr(child, 'name', None)
+        if name == TABLE_ROW:
+            yield child, False
+        elif name in TABLE_SECTIONS:
+            yield from ((row, name == TABLE_HEAD) for row in child.contents
+                        if getattr(row, 'name', None) == TABLE_ROW)
+
+
+def span(cell, attribute: str, limit: int) -> int:
+    """
+    Return the colspan or rowspan of 'cell', 1 if it is missing or not a positive number
+    """
+    value = cell.get(attribute)
+    if value is None:
+        return 1
+    try:
+        return min(max(int(value), 1), limit)
+    except ValueError:
+        return 1